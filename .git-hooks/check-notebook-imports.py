@@ -34,6 +34,7 @@ ALLOWLIST = {
     # Local helper modules shipped alongside notebooks
     "local_sageiii_plot",
     "tolnet_v01",
+    "pandora_sidecar",
     # Proprietary / platform-specific (cannot be pip-installed)
     "arcpy",
     # Installed via !pip in notebook cells rather than as a project dependency
@@ -5,14 +5,20 @@ import earthaccess
 import platform
 from subprocess import Popen
 import shutil
-import codecs
 import numpy as np
+import pandas as pd
 import h5py
 import matplotlib.pyplot as plt
 from urllib.request import urlopen
 from pathlib import Path
 from datetime import datetime  # needed to work with time in plotting time series
 
+# helpers reading Pandora and EPIC files, shared with the TOLNet script
+sys.path.append(str(Path(__file__).resolve().parents[2] / "TOLNet"))
+from epic_grid import bilinear_sample  # noqa: E402
+from pandora_fields import pandora_field_position, read_pandora_schema  # noqa: E402
+from pandora_sidecar import load_pandora_sidecar, save_pandora_sidecar  # noqa: E402
+
 
 def read_pandora_web():
     url = "https://data.pandonia-global-network.org/"
@@ -155,6 +161,144 @@ def read_timestamp(timestamp):
     return yyyy, mm, dd, hh, mn, ss
 
 
+# function read_pandora_header reads the header of a Pandora L2 file up to the second
+# line of dashes, which separates the column descriptions from the data.
+# it returns location latitude, longitude and short name, and the byte offset
+# of the first data line, so that the data block can be handed to a fast reader.
+def read_pandora_header(fname):
+    lat, lon, loc_name = -999.0, -999.0, ""
+    separators = 0
+    with open(fname, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode("utf-8", errors="ignore")
+
+            if line.find("Short location name:") >= 0:
+                loc_name = line.split()[-1]  # location name, to be used in the output file name
+
+            if line.find("Location latitude [deg]:") >= 0:
+                lat = float(line.split()[-1])  # location latitude
+
+            if line.find("Location longitude [deg]:") >= 0:
+                lon = float(line.split()[-1])  # location longitude
+
+            if line.find("--------") >= 0:
+                separators = separators + 1
+                if separators == 2:
+                    return lat, lon, loc_name, f.tell()
+
+    return lat, lon, loc_name, None
+
+
+# function read_pandora_columns reads selected columns of the data block of a Pandora L2 file.
+# Arguments:
+# fname - name file to be read, string;
+# usecols - 0-based positions of the columns to read, the first one being the timestamp;
+# dtypes - optional dictionary of numpy types of the columns, by position;
+# product - optional name of the product read, e.g. 'O3_rout2p1-8'. When given, the columns
+#           are kept in a sidecar file and later calls read them from it instead of the text.
+# it returns location latitude, longitude and short name, and a pandas DataFrame
+# with one column per position in usecols. The data block is tokenized by the pandas C
+# parser and all other columns are skipped without being converted.
+def read_pandora_columns(fname, usecols, dtypes=None, product=None):
+    usecols = list(usecols)
+    if product is not None:
+        sidecar = load_pandora_sidecar(
+            fname, product, "columns", ("usecols", "lat", "lon", "loc_name")
+        )
+        if sidecar is not None and list(sidecar["usecols"]) == usecols:
+            data = pd.DataFrame({col: sidecar[f"col_{col}"] for col in usecols})
+            return float(sidecar["lat"]), float(sidecar["lon"]), str(sidecar["loc_name"]), data
+
+    lat, lon, loc_name, offset = read_pandora_header(fname)
+    if offset is None:
+        return lat, lon, loc_name, pd.DataFrame(columns=usecols)
+
+    with open(fname, "rb") as f:
+        f.seek(offset)
+        data = pd.read_csv(
+            f,
+            sep=r"\s+",
+            header=None,
+            usecols=usecols,
+            dtype=dtypes,
+            engine="c",
+            encoding="utf-8",
+            encoding_errors="ignore",
+            on_bad_lines="skip",
+        )
+
+    if product is not None:
+        # string columns (timestamps) are stored as fixed-width unicode so that no pickling is needed
+        arrays = {}
+        for col in usecols:
+            values = data[col].to_numpy()
+            arrays[f"col_{col}"] = values.astype(str) if values.dtype == object else values
+        save_pandora_sidecar(
+            fname,
+            product,
+            "columns",
+            usecols=np.array(usecols),
+            lat=lat,
+            lon=lon,
+            loc_name=loc_name,
+            **arrays,
+        )
+
+    return lat, lon, loc_name, data
+
+
+# function read_pandora_fields reads columns of a Pandora L2 file requested by name,
+# with names matched against the column descriptions in the file header, see pandora_fields.py.
+# The same call works for any Pandora product, as column positions are taken from the file itself.
+# Arguments:
+# fname - name file to be read, string;
+# fields - list of names of the fields to read, or of their 0-based positions;
+# product - optional name of the product read, e.g. 'O3_rout2p1-8', to keep the fields in a sidecar file.
+# it returns location latitude, longitude and short name, and a dictionary from field name
+# to numpy array. The timestamp field (column 1) is an array of strings, all others are floats.
+# Only the requested columns are converted, all other fields of a line are skipped.
+def read_pandora_fields(fname, fields, product=None):
+    schema = read_pandora_schema(fname)
+    positions = {field: pandora_field_position(schema, field) for field in fields}
+    usecols = sorted(set(positions.values()))
+    dtypes = {col: str if col == 0 else np.float64 for col in usecols}
+
+    lat, lon, loc_name, columns = read_pandora_columns(fname, usecols, dtypes, product=product)
+
+    return (
+        lat,
+        lon,
+        loc_name,
+        {field: columns[col].to_numpy(dtype=dtypes[col]) for field, col in positions.items()},
+    )
+
+
+# fields of Pandora O3 files rout2p1-8 read by read_Pandora_O3_rout2p1_8_v2, given by the beginning
+# of their descriptions in the file header, e.g. "Column 39: Ozone total vertical column amount
+# [moles per square meter], ...". The timestamp is always the first column, so it is given by position.
+PANDORA_O3_FIELDS = {
+    "timestamp": 0,
+    "QF": "L2 data quality flag for ozone",
+    "column": "Ozone total vertical column amount",
+    "column_unc": "rms-based uncertainty of ozone total vertical column amount",
+}
+
+
+# function split_timestamps converts an array of Pandora timestamps of the format
+# 'yyyymmddThhmmss.sZ' into 6 arrays: integer year, month, day, hour, minute, and real second.
+def split_timestamps(timestamps):
+    stamps = pd.Series(timestamps, dtype=str)
+
+    yyyy = stamps.str.slice(0, 4).astype(np.int64).to_numpy()
+    mm = stamps.str.slice(4, 6).astype(np.int64).to_numpy()
+    dd = stamps.str.slice(6, 8).astype(np.int64).to_numpy()
+    hh = stamps.str.slice(9, 11).astype(np.int64).to_numpy()
+    mn = stamps.str.slice(11, 13).astype(np.int64).to_numpy()
+    ss = stamps.str.slice(13, 17).astype(np.float64).to_numpy()
+
+    return yyyy, mm, dd, hh, mn, ss
+
+
 # function read_Pandora_O3_rout2p1_8. It is to be used for the future validation efforts.
 # The difference with the original version is that instead of discriminating negative values of the total O3 column,
 # it uses quality flags. It was previously found that QF == 0 does not occure often enough,
@@ -175,78 +319,40 @@ def read_timestamp(timestamp):
 #
 # O3 column and its uncertainties are in mol/m^2, so conversion to Dobson Units is
 # performed by multiplication by DU_conversion = 1./4.4615E-04
+#
+# only the timestamp, quality flag, O3 column and its rms-based uncertainty are read,
+# located by their descriptions in the file header, see PANDORA_O3_FIELDS,
+# and filtering and conversion are done on whole columns at once.
 def read_Pandora_O3_rout2p1_8_v2(fname, start_date, end_date):
     DU_conversion = 1.0 / 4.4615e-04
 
     data = np.empty([0, 8])
     if start_date > end_date:
-        return -999.0, -999.0, data
-
-    with codecs.open(fname, "r", encoding="utf-8", errors="ignore") as f:
-        while True:
-            # Get next line from file
-            line = f.readline()
+        return -999.0, -999.0, "", data
 
-            if line.find("Short location name:") >= 0:
-                loc_name = line.split()[-1]  # location name, to be used in the output file name
-                print("location name ", loc_name)
+    lat, lon, loc_name, fields = read_pandora_fields(
+        fname, list(PANDORA_O3_FIELDS.values()), product="O3_rout2p1-8"
+    )
+    columns = {key: fields[name] for key, name in PANDORA_O3_FIELDS.items()}
+    print("location name ", loc_name)
+    print("location latitude ", lat)
+    print("location longitude ", lon)
 
-            if line.find("Location latitude [deg]:") >= 0:
-                lat = float(line.split()[-1])  # location latitude
-                print("location latitude ", lat)
+    timestamps = columns["timestamp"]
+    QF = columns["QF"]  # quality flag
+    date_stamp = pd.Series(timestamps, dtype=str).str.slice(0, 8).astype(np.int64).to_numpy()
 
-            if line.find("Location longitude [deg]:") >= 0:
-                lon = float(line.split()[-1])  # location longitude
-                print("location longitude ", lon)
+    keep = (date_stamp >= start_date) & (date_stamp <= end_date) & ((QF == 0) | (QF == 10))
+    if not keep.any():
+        return lat, lon, loc_name, data
 
-            if line.find("--------") >= 0:
-                break
-
-        while True:
-            # Get next line from file
-            line = f.readline()
+    yyyy, mm, dd, hh, mn, ss = split_timestamps(timestamps[keep])
+    column = columns["column"][keep]
+    column_unc = columns["column_unc"][keep]
 
-            if line.find("--------") >= 0:
-                break
-
-        while True:
-            # now reading line with data
-            line = f.readline()
-
-            if not line:
-                break
-
-            line_split = line.split()
-
-            yyyy, mm, dd, hh, mn, ss = read_timestamp(line_split[0])
-            date_stamp = yyyy * 10000 + mm * 100 + dd
-            if date_stamp < start_date or date_stamp > end_date:
-                continue
-
-            QF = int(line_split[35])  # quality flag
-
-            if QF == 0 or QF == 10:
-                column = float(line_split[38])
-                #        column_unc = float(line_split[42]) # Total uncertainty of ozone total vertical column amount [moles per square meter]
-                column_unc = float(
-                    line_split[43]
-                )  # rms-based uncertainty of ozone total vertical column amount [moles per square meter]
-                data = np.append(
-                    data,
-                    [
-                        [
-                            yyyy,
-                            mm,
-                            dd,
-                            hh,
-                            mn,
-                            ss,
-                            column * DU_conversion,
-                            column_unc * DU_conversion,
-                        ]
-                    ],
-                    axis=0,
-                )
+    data = np.column_stack(
+        (yyyy, mm, dd, hh, mn, ss, column * DU_conversion, column_unc * DU_conversion)
+    ).astype(np.float64)
 
     return lat, lon, loc_name, data
 
@@ -257,64 +363,17 @@ def read_DSCOVR_EPIC_L4_totO3(fname, lat0, lon0):
     # the function returns a list of the same length as lat0 and lon0
 
     # Open file.
-    f = h5py.File(fname, "r")
-
-    lat = np.array(f["Latitude"])
-    lon = np.array(f["Longitude"])
-    totO3 = np.array(f["TotalColumnOzone"])
-    f.close()
-
-    nlat = len(lat)
-    nlon = len(lon)
+    with h5py.File(fname, "r") as f:
+        lat = np.array(f["Latitude"])
+        lon = np.array(f["Longitude"])
+        totO3 = np.array(f["TotalColumnOzone"])
 
     n_poi = min(len(lat0), len(lon0))
 
-    # interpolate ozone column for the POIs in a cycle
-    O3_col = [0.0] * n_poi
-
-    for k in range(n_poi):
-        i0 = -1
-        j0 = -1
-
-        # search for coordinates
-        for i in range(nlat - 1):
-            if lat0[k] > lat[i] and lat0[k] < lat[i + 1]:
-                i0 = i
-                break
-
-        for j in range(nlon - 1):
-            if lon0[k] > lon[j] and lon0[k] < lon[j + 1]:
-                j0 = j
-                break
-
-        if i0 < 0 or j0 < 0:
-            print(lat0[k], min(lat), max(lat), lon0[k], min(lon), max(lon), fname)
-            sys.exit()
-
-        wtSW = (lat[i0 + 1] - lat0[k]) * (lon[j0 + 1] - lon0[k])  # weight for totO3[i0, j0]
-        wtNW = (lat0[k] - lat[i0]) * (lon[j0 + 1] - lon0[k])  # weight for totO3[i0+1, j0]
-        wtSE = (lat[i0 + 1] - lat0[k]) * (lon0[k] - lon[j0])  # weight for totO3[i0, j0+1]
-        wtNE = (lat0[k] - lat[i0]) * (lon0[k] - lon[j0])  # weight for totO3[i0+1, j0+1]
-
-        wt_sum = 0.0
-
-        if totO3[i0, j0] > 0.0:
-            wt_sum = wt_sum + wtSW
-            O3_col[k] = O3_col[k] + wtSW * totO3[i0, j0]
-        if totO3[i0 + 1, j0] > 0.0:
-            wt_sum = wt_sum + wtNW
-            O3_col[k] = O3_col[k] + wtNW * totO3[i0 + 1, j0]
-        if totO3[i0, j0 + 1] > 0.0:
-            wt_sum = wt_sum + wtSE
-            O3_col[k] = O3_col[k] + wtSE * totO3[i0, j0 + 1]
-        if totO3[i0 + 1, j0 + 1] > 0.0:
-            wt_sum = wt_sum + wtNE
-            O3_col[k] = O3_col[k] + wtNE * totO3[i0 + 1, j0 + 1]
-
-        if wt_sum > 0.0:
-            O3_col[k] = O3_col[k] / wt_sum
-
-    return O3_col
+    # interpolate ozone column for all POIs at once
+    [O3_col] = bilinear_sample(lat, lon, [totO3], lat0[:n_poi], lon0[:n_poi])
+
+    return list(O3_col)
 
 
 # Smooth Pandora retievals and interplate them into other time series times
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark of the TOLNet API client in tolnet_v01.py.
+
+A local HTTP server stands in for tolnet.larc.nasa.gov and answers the catalog pages
+(/api/data/{page}), the file payloads (/api/data/json/{id}) and the reference tables
+with synthetic lidar profiles, optionally after an artificial latency. The client is then
+timed stage by stage: catalog listing, a cold import, a warm import served from the
+local caches, and the curtain plots. Each stage reports its wall time, the requests and
+bytes it cost, its throughput and its peak Python memory, the latter from a second pass
+run under tracemalloc so that tracing does not distort the timings. The per-request
+latencies seen by the client are reported for each stage from its request_log, as the
+count and p50/p95 per endpoint. The curtains are drawn but not saved, so nothing is
+written outside the temporary cache.
+
+Example:
+    python benchmark_tolnet_v01.py --files 200 --latency 0.05 --json results.json
+"""
+
+import argparse
+import json
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import matplotlib
+
+matplotlib.use("Agg")
+
+from tolnet_v01 import TOLNet  # noqa: E402
+
+REFERENCE_TABLES = {
+    "/api/data/product_types": [
+        {"id": 4, "product_type_name": "HIRES"},
+        {"id": 5, "product_type_name": "CLIM"},
+    ],
+    "/api/data/file_types": [{"id": 1, "file_type_name": "HDF"}],
+    "/api/instruments/groups": [
+        {"id": 1, "instrument_group_name": "NASA JPL SMOL-2"},
+        {"id": 2, "instrument_group_name": "NASA GSFC TROPOZ"},
+        {"id": 3, "instrument_group_name": "NASA LaRC LMOL"},
+    ],
+    "/api/data/processing_types": [
+        {"id": 1, "processing_type_name": "Centrally Processed (GLASS)"},
+        {"id": 2, "processing_type_name": "In-House"},
+    ],
+}
+
+SITES = [
+    ("NASA JPL SMOL-2", 1, 34.38, -117.68, "Table.Mountain.CA"),
+    ("NASA GSFC TROPOZ", 2, 38.99, -76.84, "Greenbelt.MD"),
+    ("NASA LaRC LMOL", 3, 37.1, -76.39, "Hampton.VA"),
+]
+
+
+class synthetic_api:
+    """
+    The files served by the stand-in API: files_per_day profiles per day from start_date,
+    cycling through the sites in SITES, each with n_times profiles of n_altitudes levels.
+    """
+
+    def __init__(
+        self, n_files=100, files_per_day=6, n_times=120, n_altitudes=300, start_date="2023-08-01"
+    ):
+        self.n_times = n_times
+        self.n_altitudes = n_altitudes
+        self.per_page = 50
+
+        start = pd.Timestamp(start_date)
+        self.catalog = []
+        for i in range(n_files):
+            name, group_id, lat, lon, location = SITES[i % len(SITES)]
+            day = start + pd.Timedelta(days=i // files_per_day)
+            begin = day + pd.Timedelta(hours=2 * (i % files_per_day))
+            self.catalog.append(
+                {
+                    "id": 1000 + i,
+                    "file_name": f"tolnet-{group_id}-{begin:%Y%m%dt%H%M%S}_R1.hdf",
+                    "file_server_location": "/data",
+                    "author": "benchmark",
+                    "instrument_group_id": group_id,
+                    "product_type_id": 4,
+                    "file_type_id": 1,
+                    "start_data_date": f"{begin:%Y-%m-%d %H:%M:%S}",
+                    "end_data_date": f"{begin + pd.Timedelta(hours=2):%Y-%m-%d %H:%M:%S}",
+                    "upload_date": f"{day + pd.Timedelta(days=30):%Y-%m-%d %H:%M:%S}",
+                    "public": True,
+                    "instrument_group_name": name,
+                    "folder_name": name,
+                    "current_pi": "benchmark",
+                    "doi": "",
+                    "citation_url": "",
+                    "product_type_name": "HIRES",
+                    "processing_type_name": "Centrally Processed (GLASS)",
+                    "file_type_name": "HDF",
+                    "revision": 1,
+                    "near_real_time": "no",
+                    "file_size": 1000,
+                    "latitude": int(lat),
+                    "longitude": int(lon),
+                    "altitude": 100,
+                    "isAccessible": True,
+                    "_site": (lat, lon, location),
+                }
+            )
+        self.by_id = {record["id"]: record for record in self.catalog}
+
+    def page(self, number, min_date, max_date):
+        end = pd.Timestamp(max_date) + pd.Timedelta(days=1)
+        matches = [
+            record
+            for record in self.catalog
+            if pd.Timestamp(min_date) <= pd.Timestamp(record["start_data_date"]) < end
+        ]
+        matches.sort(key=lambda record: record["start_data_date"], reverse=True)
+        rows = matches[(number - 1) * self.per_page : number * self.per_page]
+        return [
+            {
+                "row": (number - 1) * self.per_page + i + 1,
+                "count": len(matches),
+                **{key: value for key, value in record.items() if key != "_site"},
+            }
+            for i, record in enumerate(rows)
+        ]
+
+    def payload(self, file_id):
+        record = self.by_id[file_id]
+        lat, lon, location = record["_site"]
+        times = pd.date_range(record["start_data_date"], periods=self.n_times, freq="1min")
+        altitude = np.arange(self.n_altitudes) * 15.0 + 100.0
+        rng = np.random.default_rng(file_id)
+        values = rng.uniform(20, 90, (self.n_times, self.n_altitudes)).round(2)
+        return {
+            "datetime": {"data": [f"{t:%Y-%m-%d %H:%M:%S}" for t in times]},
+            "altitude": {"data": altitude.tolist()},
+            "value": {"data": values.tolist()},
+            "LATITUDE.INSTRUMENT": lat,
+            "LONGITUDE.INSTRUMENT": lon,
+            "attributes": {"DATA_LOCATION": location},
+            "fileInfo": {
+                "file_name": record["file_name"],
+                "start_data_date": record["start_data_date"],
+                "instrument_group_name": record["instrument_group_name"],
+                "processing_type_name": record["processing_type_name"],
+            },
+        }
+
+
+def serve(api: synthetic_api, latency=0.0):
+    """
+    Starts the stand-in API on a free local port in a background thread.
+
+    Returns
+    -------
+    The server, its base URL, and a dictionary counting the requests and bytes served.
+    """
+    stats = {"requests": 0, "bytes": 0}
+    lock = threading.Lock()
+    payloads = {}
+
+    class handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: value[0] for key, value in parse_qs(url.query).items()}
+            body, status = None, 200
+
+            if url.path in REFERENCE_TABLES:
+                body = json.dumps(REFERENCE_TABLES[url.path]).encode()
+            elif match := re.fullmatch(r"/api/data/json/(\d+)", url.path):
+                file_id = int(match.group(1))
+                if file_id in api.by_id:
+                    if file_id not in payloads:
+                        payloads[file_id] = json.dumps(api.payload(file_id)).encode()
+                    body = payloads[file_id]
+            elif match := re.fullmatch(r"/api/data/(\d+)", url.path):
+                page = api.page(int(match.group(1)), query["min_date"], query["max_date"])
+                body = json.dumps(page).encode()
+                status = 200 if page else 404
+
+            if body is None:
+                body, status = b"{}", 404
+            if latency:
+                time.sleep(latency)
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                stats["requests"] += 1
+                stats["bytes"] += len(body)
+
+        def log_message(self, format, *args):
+            return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api", stats
+
+
+def measure(name, stats, function, n_files=None, trace_memory=False, client=None):
+    """
+    Runs one benchmark stage and returns its wall time, server requests and bytes,
+    throughput, with trace_memory its peak traced memory, and with client the
+    request_log.summary() of the requests the client sent during the stage.
+    """
+    requests_before, bytes_before = stats["requests"], stats["bytes"]
+    if client is not None:
+        client.request_log.clear()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+
+    result = {
+        "stage": name,
+        "seconds": elapsed,
+        "requests": stats["requests"] - requests_before,
+        "megabytes": (stats["bytes"] - bytes_before) / 1024**2,
+        "peak_memory_mb": peak,
+        "endpoints": client.request_log.summary() if client is not None else {},
+    }
+    result["megabytes_per_second"] = result["megabytes"] / elapsed if elapsed else 0.0
+    if n_files is not None:
+        result["files_per_second"] = n_files / elapsed if elapsed else 0.0
+    return result
+
+
+def stages(url, stats, min_date, max_date, n_files, max_workers, dtype, plots, trace_memory):
+    """
+    Runs the catalog, cold import, warm import and plotting stages in order against a
+    fresh temporary cache.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = TOLNet(cache_dir=cache_dir)
+        cold.tolnet_url = url
+        warm = TOLNet(cache_dir=cache_dir)
+        warm.tolnet_url = url
+
+        for name, function, files, client in [
+            (
+                "get_files_list",
+                lambda: cold.get_files_list(min_date, max_date, max_workers),
+                1,
+                cold,
+            ),
+            (
+                "import_data (cold)",
+                lambda: cold.import_data(min_date, max_date, max_workers, dtype=dtype),
+                1,
+                cold,
+            ),
+            (
+                "import_data (warm)",
+                lambda: warm.import_data(min_date, max_date, max_workers, dtype=dtype),
+                1,
+                warm,
+            ),
+            # savename=None draws the figures without writing PNGs to the working directory.
+            ("tolnet_curtains", lambda: warm.tolnet_curtains(show=False, savename=None), 0, warm),
+        ]:
+            if name == "tolnet_curtains" and not plots:
+                continue
+            results.append(
+                measure(name, stats, function, n_files if files else None, trace_memory, client)
+            )
+
+        for client in (cold, warm):
+            errors = client.troubleshoot["TOLNet"]
+            if errors:
+                print(f"{len(errors)} client errors, first: {errors[0]}")
+    return results
+
+
+def run(
+    n_files=100,
+    files_per_day=6,
+    n_times=120,
+    n_altitudes=300,
+    latency=0.0,
+    max_workers=8,
+    dtype="float64",
+    plots=True,
+    trace_memory=True,
+):
+    """
+    Runs every benchmark stage against a fresh stand-in API and temporary cache. Tracing
+    allocations slows the client several times over, so timings come from an untraced
+    pass and, with trace_memory, peak memory from a second, traced pass.
+
+    Returns
+    -------
+    A list of dictionaries, one per stage.
+    """
+    api = synthetic_api(n_files, files_per_day, n_times, n_altitudes)
+    server, url, stats = serve(api, latency)
+    dates = (api.catalog[0]["start_data_date"][:10], api.catalog[-1]["start_data_date"][:10])
+
+    try:
+        results = stages(url, stats, *dates, n_files, max_workers, dtype, plots, False)
+        if trace_memory:
+            traced = stages(url, stats, *dates, n_files, max_workers, dtype, plots, True)
+            for result, memory in zip(results, traced, strict=True):
+                result["peak_memory_mb"] = memory["peak_memory_mb"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return results
+
+
+def report(results):
+    header = f"{'stage':<20}{'seconds':>10}{'requests':>10}{'MB':>10}{'MB/s':>10}"
+    header += f"{'files/s':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        files = result.get("files_per_second")
+        memory = result["peak_memory_mb"]
+        print(
+            f"{result['stage']:<20}{result['seconds']:>10.3f}{result['requests']:>10d}"
+            f"{result['megabytes']:>10.2f}{result['megabytes_per_second']:>10.2f}"
+            f"{files if files is not None else float('nan'):>10.1f}"
+            f"{memory if memory is not None else float('nan'):>10.1f}"
+        )
+
+    header = f"{'stage':<20}{'endpoint':<12}{'requests':>10}{'errors':>8}{'retries':>9}"
+    header += f"{'p50 ms':>10}{'p95 ms':>10}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        for endpoint, summary in result["endpoints"].items():
+            if endpoint == "all":
+                continue
+            print(
+                f"{result['stage']:<20}{endpoint:<12}{summary['requests']:>10d}"
+                f"{summary['errors']:>8d}{summary['retries']:>9d}"
+                f"{summary['latency_p50'] * 1000:>10.1f}{summary['latency_p95'] * 1000:>10.1f}"
+            )
+    return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=100, help="number of files in the catalog")
+    parser.add_argument("--files-per-day", type=int, default=6)
+    parser.add_argument("--times", type=int, default=120, help="profiles per file")
+    parser.add_argument("--altitudes", type=int, default=300, help="levels per profile")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per request")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--dtype", default="float64", choices=["float64", "float32"])
+    parser.add_argument("--no-plots", action="store_true", help="skip tolnet_curtains")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the traced pass measuring peak memory"
+    )
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(
+        n_files=args.files,
+        files_per_day=args.files_per_day,
+        n_times=args.times,
+        n_altitudes=args.altitudes,
+        latency=args.latency,
+        max_workers=args.workers,
+        dtype=args.dtype,
+        plots=not args.no_plots,
+        trace_memory=not args.no_memory,
+    )
+    report(results)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
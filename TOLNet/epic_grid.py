@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Sampling of gridded DSCOVR EPIC L4 fields at points of interest.
+
+EPIC L4 files hold total and tropospheric ozone columns on a regular latitude/longitude
+grid. The scripts comparing them with Pandora and TOLNet need these columns at the
+locations of the ground instruments, for every granule of a day.
+
+Used by script_for_DSCOVR_EPIC_L4_TrO3_vs_tolnet_clim_vs_pandora.py and
+DSCOVR/additional_drafts/DSCOVR_EPIC_L4_TrO3_vs_Pandora.py.
+"""
+
+import numpy as np
+
+
+def bilinear_sample(lat, lon, grids, lat0, lon0):
+    """
+    Interpolates gridded fields to points of interest.
+
+    lat and lon are ascending 1D axes of the grid, e.g. Latitude and Longitude of an EPIC
+    L4 file, grids is a list of 2D arrays of shape (len(lat), len(lon)), e.g. total and
+    tropospheric O3 column, and lat0 and lon0 are arrays of latitudes and longitudes of
+    the points of interest.
+
+    Each point is interpolated bilinearly from the 4 nodes of the grid cell it falls in,
+    taking into account only nodes with positive (valid) values, with their weights
+    renormalized. Cells are found with np.searchsorted, and all points and all grids are
+    interpolated at once.
+
+    Returns an array of shape (len(grids), number of points); points outside the grid,
+    or without valid nodes around them, get 0.
+    """
+    lat0 = np.asarray(lat0, dtype=np.float64)
+    lon0 = np.asarray(lon0, dtype=np.float64)
+
+    # south-west node of the cell of each point; points on the last node use the last cell
+    i0 = np.clip(np.searchsorted(lat, lat0, side="right") - 1, 0, len(lat) - 2)
+    j0 = np.clip(np.searchsorted(lon, lon0, side="right") - 1, 0, len(lon) - 2)
+    inside = (lat0 >= lat[0]) & (lat0 <= lat[-1]) & (lon0 >= lon[0]) & (lon0 <= lon[-1])
+
+    # weights and indices of SW, NW, SE and NE nodes, shape (4, number of points)
+    weights = np.stack(
+        (
+            (lat[i0 + 1] - lat0) * (lon[j0 + 1] - lon0),
+            (lat0 - lat[i0]) * (lon[j0 + 1] - lon0),
+            (lat[i0 + 1] - lat0) * (lon0 - lon[j0]),
+            (lat0 - lat[i0]) * (lon0 - lon[j0]),
+        )
+    )
+    rows = np.stack((i0, i0 + 1, i0, i0 + 1))
+    cols = np.stack((j0, j0, j0 + 1, j0 + 1))
+
+    # node values of all grids, shape (number of grids, 4, number of points)
+    values = np.stack([np.asarray(grid)[rows, cols] for grid in grids])
+    valid = values > 0.0
+    wt_sum = np.where(valid, weights, 0.0).sum(axis=1)
+    total = np.where(valid, weights * values, 0.0).sum(axis=1)
+    sampled = np.divide(total, wt_sum, out=np.zeros_like(total), where=wt_sum > 0.0)
+
+    return np.where(inside, sampled, 0.0)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Columns of Pandora L2 text files located by name.
+
+The header of a Pandora L2 file describes every column of its data lines, e.g.
+"Column 39: Ozone total vertical column amount [moles per square meter], ...".
+Column positions differ between products and processing versions, so the scripts
+reading these files look columns up by the beginning of their description instead
+of hard-coding positions.
+
+Used by script_for_DSCOVR_EPIC_L4_TrO3_vs_tolnet_clim_vs_pandora.py and
+DSCOVR/additional_drafts/DSCOVR_EPIC_L4_TrO3_vs_Pandora.py.
+"""
+
+import numpy as np
+
+
+def read_pandora_schema(fname):
+    """
+    Reads the column description block of a Pandora L2 file, i.e. the lines
+    'Column N: description' between the two lines of dashes.
+
+    Returns a list of descriptions, the description of column N being at position N - 1,
+    which is also the position of the column in a data line. Description lines that do
+    not start with 'Column N:' continue the description of the previous column.
+    """
+    schema = []
+    separators = 0
+    with open(fname, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+
+            if line.find("--------") >= 0:
+                separators = separators + 1
+                if separators == 2:
+                    break
+                continue
+
+            if separators == 1:
+                head, _, description = line.partition(":")
+                if head.startswith("Column ") and head[7:].strip().isdigit():
+                    position = int(head[7:]) - 1
+                    schema.extend([""] * (position + 1 - len(schema)))
+                    schema[position] = description.strip()
+                elif schema and line:
+                    schema[-1] = schema[-1] + " " + line
+
+    return schema
+
+
+def pandora_field_position(schema, name):
+    """
+    Returns the position of a column given by name in a schema returned by
+    read_pandora_schema. Name is matched against the beginning of column descriptions,
+    ignoring case, e.g. 'L2 data quality flag for ozone', and must match exactly one
+    column, otherwise ValueError is raised. An integer name is taken as the position itself.
+    """
+    if isinstance(name, (int, np.integer)):
+        return int(name)
+
+    key = name.strip().lower()
+    positions = [i for i, description in enumerate(schema) if description.lower().startswith(key)]
+    if len(positions) != 1:
+        raise ValueError(
+            f"field '{name}' matches {len(positions)} Pandora columns: "
+            + "; ".join(f"Column {i + 1}: {schema[i]}" for i in positions)
+        )
+
+    return positions[0]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Sidecar files caching what has been parsed from Pandora L2 text files.
+
+Parsing a Pandora file is slow, so the scripts reading them keep the parsed arrays in a
+sidecar .npz file next to the text file, e.g. Pandora34s1_WrightwoodCA_L2_rout2p1-8.txt
+gets Pandora34s1_WrightwoodCA_L2_rout2p1-8.txt.O3_rout2p1-8.days.npz. The name carries
+the product read and the layout of the arrays, so that readers keeping different arrays
+for the same file never read each other's sidecar. A sidecar is only used while the
+size and modification time of the text file match the ones it was written for, so a
+re-downloaded file is parsed again.
+
+Used by script_for_DSCOVR_EPIC_L4_TrO3_vs_tolnet_clim_vs_pandora.py,
+DSCOVR/additional_drafts/DSCOVR_EPIC_L4_TrO3_vs_Pandora.py and the Pandora readers of
+the TEMPO NO2 and HCHO validation notebooks in TEMPO/L2_validation_codes.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Bumped whenever the arrays kept in a layout change, so that old sidecars are ignored.
+SIDECAR_VERSION = 1
+
+
+def pandora_sidecar_path(fname, product, layout):
+    """
+    Returns the path of the sidecar of fname keeping the arrays of the given layout,
+    e.g. "days", read for product, e.g. "O3_rout2p1-8". product may be None for
+    sidecars that do not depend on the product, such as the date index.
+    """
+    tags = [tag for tag in (product, layout) if tag]
+    return Path(".".join([str(fname), *tags, "npz"]))
+
+
+def load_pandora_sidecar(fname, product, layout, keys=()):
+    """
+    Returns a dictionary of the arrays saved by save_pandora_sidecar, or None if there is
+    no sidecar for this version of the file, product and layout, or if it lacks any of
+    the arrays named in keys. A None is a cache miss: the caller parses the file again.
+    """
+    try:
+        stat = os.stat(fname)
+        with np.load(pandora_sidecar_path(fname, product, layout), allow_pickle=False) as sidecar:
+            if (
+                int(sidecar["size"]) != stat.st_size
+                or int(sidecar["mtime_ns"]) != stat.st_mtime_ns
+                or str(sidecar["product"]) != str(product)
+                or str(sidecar["layout"]) != layout
+                or int(sidecar["version"]) != SIDECAR_VERSION
+                or any(key not in sidecar.files for key in keys)
+            ):
+                return None
+            return {key: sidecar[key] for key in sidecar.files}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_pandora_sidecar(fname, product, layout, **arrays):
+    """
+    Saves arrays parsed from a Pandora file into its sidecar for product and layout,
+    together with the size and modification time of the file. Failing to write the
+    sidecar, e.g. in a read-only directory, is not an error.
+    """
+    path = pandora_sidecar_path(fname, product, layout)
+    partial = path.with_name(path.name + ".part")
+    try:
+        stat = os.stat(fname)
+        with open(partial, "wb") as f:
+            np.savez(
+                f,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                product=str(product),
+                layout=layout,
+                version=SIDECAR_VERSION,
+                **arrays,
+            )
+        os.replace(partial, path)
+    except OSError:
+        pass
+    return
@@ -5,10 +5,127 @@ import codecs
 import requests
 import h5py
 from pyhdf.SD import SD, SDC
-from jdcal import jd2gcal
 import matplotlib.pyplot as plt
 from urllib.request import urlopen, Request
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from epic_grid import bilinear_sample
+from pandora_fields import pandora_field_position, read_pandora_schema
+from pandora_sidecar import load_pandora_sidecar, save_pandora_sidecar
+
+
+# SDS read from a TOLNet clim file; nothing else in the file is touched.
+TOLNET_CLIM_SDS = {
+    "lat": "LATITUDE.INSTRUMENT",
+    "lon": "LONGITUDE.INSTRUMENT",
+    "altitude": "ALTITUDE",
+    "start_time": "DATETIME.START",
+    "stop_time": "DATETIME.STOP",
+    "o3_number_density": "O3.NUMBER.DENSITY_ABSORPTION.DIFFERENTIAL",
+}
+
+# molecules per m^2 in one Dobson unit, see https://www.temis.nl/general/dobsonunit.php
+DU_MOLECULES_M2 = 2.6867e20
+
+# top of the tropospheric column, m
+TROPOPAUSE_ALTITUDE = 10000.0
+
+# Pandora product read from the L2 files, used to name their sidecar files, see pandora_sidecar.py
+PANDORA_PRODUCT = "O3_rout2p1-8"
+
+# ozone column read from the Pandora L2 files, given by the beginning of its description
+# in the file header, see pandora_fields.py
+PANDORA_O3_COLUMN = "Ozone total vertical column amount"
+
+# arrays kept in the sidecar of a Pandora file read whole by read_pandora_days,
+# and in the sidecar holding its date index
+PANDORA_DAYS_KEYS = ("lat", "lon", "dates", "rows")
+PANDORA_INDEX_KEYS = ("lat", "lon", "ordered", "dates", "offsets")
+
+
+def trapezoid_weights(altitudes):
+    # function trapezoid_weights returns the weight of each level in a trapezoidal
+    # integration over the altitude grid, which does not need to be evenly spaced:
+    # half the distance between the neighbouring levels, and half a step at either end.
+    z = np.asarray(altitudes, dtype=np.float64)
+    weights = np.zeros_like(z)
+    if len(z) > 1:
+        dz = np.diff(z)
+        weights[:-1] += 0.5 * dz
+        weights[1:] += 0.5 * dz
+    return np.abs(weights)
+
+
+def integrate_columns(altitudes, o3_number_density, top=TROPOPAUSE_ALTITUDE):
+    # function integrate_columns integrates ozone number density profiles, in molecules per m^3,
+    # over altitude, in m, for all time steps at once.
+    # o3_number_density is either one profile or an array of profiles (time, altitude).
+    # negative and non-finite densities are treated as zero.
+    # the function returns total and tropospheric (below top) columns in DU, one per time step.
+    # please note that profiles do not cover altitudes above 25km, so total columns are
+    # less than they should be.
+    altitudes = np.asarray(altitudes, dtype=np.float64)
+    profiles = np.atleast_2d(np.asarray(o3_number_density, dtype=np.float64))
+    if profiles.shape[-1] != len(altitudes) and profiles.shape[0] == len(altitudes):
+        profiles = profiles.T
+    profiles = np.where(np.isfinite(profiles) & (profiles > 0.0), profiles, 0.0)
+
+    below = altitudes < top
+    o3_column = profiles @ trapezoid_weights(altitudes) / DU_MOLECULES_M2
+    tro3_column = profiles[:, below] @ trapezoid_weights(altitudes[below]) / DU_MOLECULES_M2
+    return o3_column, tro3_column
+
+
+def integrate_tolnet_clim(fname):
+    """Read the SDS needed from a TOLNET clim file and integrate its ozone profiles.
+
+    Returns a dictionary with:
+        lat, lon
+            position of the instrument
+        start_time, stop_time
+            times of the beginning and conclusion of each measurement, MJD2000
+        o3_column
+            total ozone columns, DU, one per measurement
+        tro3_column
+            tropospheric ozone columns, DU, one per measurement
+    """
+    hdf = SD(fname, SDC.READ)
+    try:
+        data = {key: np.asarray(hdf.select(name)[:]) for key, name in TOLNET_CLIM_SDS.items()}
+    finally:
+        hdf.end()
+
+    o3_column, tro3_column = integrate_columns(data["altitude"], data["o3_number_density"])
+    return {
+        "fname": fname,
+        "lat": float(np.ravel(data["lat"])[0]),
+        "lon": float(np.ravel(data["lon"])[0]),
+        "start_time": np.ravel(data["start_time"]).astype(np.float64),
+        "stop_time": np.ravel(data["stop_time"]).astype(np.float64),
+        "o3_column": o3_column,
+        "tro3_column": tro3_column,
+    }
+
+
+def _integrate_tolnet_clim_or_none(fname):
+    try:
+        return integrate_tolnet_clim(fname)
+    except Exception as e:
+        print("failed to read TOLNET clim file ", fname, e)
+        return None
+
+
+def integrate_tolnet_clim_files(fnames, max_workers=None):
+    # function integrate_tolnet_clim_files integrates many TOLNET clim files in parallel processes.
+    # it returns the results of integrate_tolnet_clim in the order of fnames,
+    # with None for files that could not be read.
+    fnames = list(fnames)
+    if len(fnames) < 2 or max_workers == 1:
+        return [_integrate_tolnet_clim_or_none(fname) for fname in fnames]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_integrate_tolnet_clim_or_none, fnames))
 
 
 def read_tolnet_clim(fname):
@@ -20,82 +137,41 @@ def read_tolnet_clim(fname):
         lon_int
             position of the instrument
         start_time[0]
-            time of the beginning of the measurement, MJD200
+            time of the beginning of the first measurement, MJD2000
         stop_time[0],
-            time of the conclusion of the measurement, MJD200
+            time of the conclusion of the first measurement, MJD2000
         o3_column,
-            total ozone columns, DU
+            total ozone column of the first measurement, DU
         tro3_column
-            tropospheric ozone columns, DU
+            tropospheric ozone column of the first measurement, DU
     """
-    hdf = SD(fname, SDC.READ)
-
-    dsets = hdf.datasets()
-
-    for dset in dsets:
-        dset_data = hdf.select(dset)
-        data = dset_data[:]
-
-        if dset == "ALTITUDE.INSTRUMENT":
-            print("TOLNET " + dset, data[0])
-
-        if dset == "LATITUDE.INSTRUMENT":
-            print("TOLNET " + dset, data[0])
-            lat_int = data[
-                0
-            ]  # latitude of TOLNET instrument, this is used to interpolate EPIC L4 ozone data
-        if dset == "LONGITUDE.INSTRUMENT":
-            print("TOLNET " + dset, data[0])
-            lon_int = data[
-                0
-            ]  # longitude of TOLNET instrument, this is used to interpolate EPIC L4 ozone data
-
-        if dset == "ALTITUDE":
-            altitudes = data
-
-        if dset == "DATETIME.START":
-            start_time = data
-
-        if dset == "DATETIME.STOP":
-            stop_time = data
-
-        if dset == "INTEGRATION.TIME":
-            pass
-            # integration_time = data
-
-        if dset == "O3.NUMBER.DENSITY_ABSORPTION.DIFFERENTIAL":
-            o3_number_density = data
-
-    hdf.end()
-
-    ntimes = len(start_time)
-    if ntimes != 1:
-        print("too many time occasions, ", ntimes)
-        print("return zeroes")
-        return 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
-
-    nalt = len(altitudes)
-    dz = altitudes[1:nalt] - altitudes[0 : nalt - 1]
-    max_dz = max(dz)
-    min_dz = min(dz)
-    if max_dz != min_dz:
-        print("uneven vertical integration steps ", max_dz, min_dz, "return zeroes")
-        return 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
-
-    # now integrate TOLNET profile to get total and tropospheric column. Please note that profile does not cover altitudes above 25km, so total column is less than it should be
-    tro3_number_density = o3_number_density[altitudes < 10000.0]
-    if max_dz == min_dz:
-        profile = o3_number_density
-        profile[profile < 0] = 0.0
-        tr_profile = tro3_number_density
-        tr_profile[tr_profile < 0] = 0.0
-        # integrated ozone profile has units molecules per m^2; division by 2.6867E+20 converts result into DU, see https://www.temis.nl/general/dobsonunit.php
-        o3_column = sum(profile[1:-1], (profile[0] + profile[-1]) * 0.5) * min_dz / 2.6867e20
-        tro3_column = (
-            sum(tr_profile[1:-1], (tr_profile[0] + tr_profile[-1]) * 0.5) * min_dz / 2.6867e20
-        )
-
-    return lat_int, lon_int, start_time[0], stop_time[0], o3_column, tro3_column
+    clim = integrate_tolnet_clim(fname)
+    return (
+        clim["lat"],
+        clim["lon"],
+        clim["start_time"][0],
+        clim["stop_time"][0],
+        clim["o3_column"][0],
+        clim["tro3_column"][0],
+    )
+
+
+def mjd2000_to_datetime(mjd2000):
+    # function mjd2000_to_datetime converts days since 2000-01-01 00:00 UTC into numpy datetime64.
+    seconds = np.round(np.asarray(mjd2000, dtype=np.float64) * 86400.0)
+    return np.datetime64("2000-01-01T00:00:00", "s") + seconds.astype("timedelta64[s]")
+
+
+def plot_tolnet_columns(ax, clim, column):
+    # function plot_tolnet_columns draws each TOLNET measurement of one day as a flat dash line
+    # from its start to its stop time, in GMT hours. column is "o3_column" or "tro3_column".
+    start = mjd2000_to_datetime(clim["start_time"])
+    stop = mjd2000_to_datetime(clim["stop_time"])
+    day = start[0].astype("datetime64[D]")
+    start_hours = (start - day) / np.timedelta64(1, "h")
+    stop_hours = (stop - day) / np.timedelta64(1, "h")
+    for t0, t1, value in zip(start_hours, stop_hours, clim[column]):
+        ax.plot([t0, t1], [value, value], linestyle="--", color="b")
 
 
 def read_pandora_web():
@@ -249,6 +325,126 @@ def timestamp2day_pandora(timestamp):
     return yyyy, mm, day
 
 
+def pandora_rows_by_day(lines, o3_position):
+    # function pandora_rows_by_day parses data lines of a Pandora O3 file
+    # into a dictionary from date stamp yyyymmdd to a list of rows:
+    # year, month, fractional day, and ozone column in Dobson units (DU).
+    # o3_position is the 0-based position of the ozone column in a data line, see pandora_o3_position.
+    DU_conversion = 1.0 / 4.4615e-04
+
+    days = {}
+    for line in lines:
+        line_split = line.split()
+        if not line_split:
+            continue
+        yyyy, mm, day = timestamp2day_pandora(line_split[0])
+        o3_col = float(line_split[o3_position]) * DU_conversion
+        days.setdefault(line_split[0][0:8], []).append([yyyy, mm, day, o3_col])
+
+    return days
+
+
+def pandora_o3_position(fname):
+    # function pandora_o3_position returns the 0-based position of the ozone column, PANDORA_O3_COLUMN,
+    # in the data lines of a Pandora file, found by its description in the file header.
+    return pandora_field_position(read_pandora_schema(fname), PANDORA_O3_COLUMN)
+
+
+def pandora_date_index(fname):
+    # function pandora_date_index returns latitude and longitude of the Pandora site
+    # and the date index of its data file: sorted date stamps yyyymmdd present in the file,
+    # and byte offsets of the first row of each date followed by the offset of the end of the data.
+    # Pandora rows are time-ordered, so all rows of a date form one contiguous block.
+    # the index is built by one pass over raw lines, which are neither decoded nor split,
+    # and is kept in a sidecar file next to the data file.
+    # if rows turn out not to be time-ordered, dates and offsets are None.
+    sidecar = load_pandora_sidecar(fname, None, "dateindex", PANDORA_INDEX_KEYS)
+    if sidecar is None:
+        lat, lon = -999.0, -999.0
+        dates, offsets = [], []
+        with open(fname, "rb") as f:
+            separators = 0
+            while separators < 2:
+                line = f.readline()
+                if not line:
+                    break
+
+                if line.find(b"Location latitude [deg]:") >= 0:
+                    lat = float(line.split()[-1])  # location latitude
+
+                if line.find(b"Location longitude [deg]:") >= 0:
+                    lon = float(line.split()[-1])  # location longitude
+
+                if line.find(b"--------") >= 0:
+                    separators = separators + 1
+
+            offset = f.tell()
+            for line in f:
+                if line.strip() and (not dates or line[0:8] != dates[-1]):
+                    dates.append(line[0:8])
+                    offsets.append(offset)
+                offset = offset + len(line)
+            offsets.append(offset)
+
+        dates = np.array([date.decode("ascii", errors="ignore") for date in dates], dtype="U8")
+        sidecar = {
+            "lat": lat,
+            "lon": lon,
+            "ordered": bool(np.all(dates[1:] > dates[:-1])),
+            "dates": dates,
+            "offsets": np.array(offsets, dtype=np.int64),
+        }
+        save_pandora_sidecar(fname, None, "dateindex", **sidecar)
+
+    if not sidecar["ordered"]:
+        return float(sidecar["lat"]), float(sidecar["lon"]), None, None
+
+    return float(sidecar["lat"]), float(sidecar["lon"]), sidecar["dates"], sidecar["offsets"]
+
+
+def read_pandora_dates(fname, yyyymmdds):
+    # function read_pandora_dates takes Pandora data file name assuming it has been downloaded
+    # and a list of date stamps of interest in the form yyyymmdd.
+    # the function returns latitude and longitude of the Pandora site
+    # and a dictionary from date stamp yyyymmdd to an array of 4 columns, as returned by read_pandora_file.
+    # only the blocks of the file holding these dates are read, found with the date index of the file.
+    # dates next to each other in the file are read as one block, so dates spread over years
+    # do not read everything in between.
+    wanted = sorted(set(yyyymmdds))
+    sidecar = load_pandora_sidecar(fname, PANDORA_PRODUCT, "days", PANDORA_DAYS_KEYS)
+    if sidecar is None:
+        lat, lon, dates, offsets = pandora_date_index(fname)
+    else:
+        dates = None  # the file has been read whole before
+
+    if dates is None:
+        lat, lon, days = read_pandora_days(fname, sidecar)
+        return lat, lon, {yyyymmdd: days[yyyymmdd] for yyyymmdd in wanted if yyyymmdd in days}
+
+    # positions of the wanted dates in the date index, then runs of consecutive positions
+    positions = [
+        i
+        for i, yyyymmdd in zip(np.searchsorted(dates, wanted), wanted)
+        if i < len(dates) and dates[i] == yyyymmdd
+    ]
+    runs = []
+    for i in positions:
+        if runs and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+
+    days = {}
+    o3_position = pandora_o3_position(fname) if runs else None
+    with open(fname, "rb") as f:
+        for i, j in runs:
+            f.seek(offsets[i])
+            lines = f.read(offsets[j] - offsets[i]).decode("utf-8", errors="ignore").splitlines()
+            days.update(pandora_rows_by_day(lines, o3_position))
+
+    return lat, lon, {yyyymmdd: np.array(rows) for yyyymmdd, rows in days.items()}
+
+
 def read_pandora_file(fname, yyyymmdd):
     # function read_pandora_file takes Pandora data file name assuming it has been downloaded
     # and date stamp of interest in the form yyyymmdd.
@@ -256,21 +452,43 @@ def read_pandora_file(fname, yyyymmdd):
     # and an array of 4 columns: year, month, fractional day, and ozone column in Dobson units (DU).
     # fractional day is time in day since beginning of the month,
     # e.g. May 31, 6:00 pm would have fractional day of 30.75.
-    DU_conversion = 1.0 / 4.4615e-04
+    # only rows of that day are read, see read_pandora_dates.
     current_year = int(yyyymmdd[0:4])
     current_month = int(yyyymmdd[4:6])
     current_day = int(yyyymmdd[6:8])
     print(current_year, current_month, current_day)
 
+    lat, lon, days = read_pandora_dates(fname, [yyyymmdd])
+
+    return lat, lon, days.get(yyyymmdd, np.array([]))
+
+
+def read_pandora_days(fname, sidecar=None):
+    # function read_pandora_days reads a whole Pandora data file once, assuming it has been downloaded,
+    # and splits it into days.
+    # the function returns latitude and longitude of the Pandora site
+    # and a dictionary from date stamp yyyymmdd to an array of 4 columns, as returned by read_pandora_file:
+    # year, month, fractional day, and ozone column in Dobson units (DU).
+    # the parsed rows are saved in a sidecar file next to the data file, and later calls read them from there.
+    # sidecar is that sidecar if the caller has already loaded it, so that it is not loaded twice.
+    if sidecar is None:
+        sidecar = load_pandora_sidecar(fname, PANDORA_PRODUCT, "days", PANDORA_DAYS_KEYS)
+    if sidecar is not None:
+        dates, rows = sidecar["dates"], sidecar["rows"]
+        # rows are saved grouped by day, so each day is a contiguous slice
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        stops = np.r_[starts[1:], len(dates)]
+        return (
+            float(sidecar["lat"]),
+            float(sidecar["lon"]),
+            {str(dates[i]): rows[i:j] for i, j in zip(starts, stops)},
+        )
+
+    o3_position = pandora_o3_position(fname)
     with codecs.open(fname, "r", encoding="utf-8", errors="ignore") as f:
         while True:
-            # Get next line from file
             line = f.readline()
 
-            if line.find("Short location name:") >= 0:
-                pass
-                # loc_name = line.split()[-1]  # location name, to be used in the output file name
-
             if line.find("Location latitude [deg]:") >= 0:
                 lat = float(line.split()[-1])  # location latitude
 
@@ -281,30 +499,23 @@ def read_pandora_file(fname, yyyymmdd):
                 break
 
         while True:
-            # Get next line from file
             line = f.readline()
 
             if line.find("--------") >= 0:
                 break
 
-        # now reading line with data
-        daily_data = []
-        while True:
-            line = f.readline()
-
-            if not line:
-                break
-
-            line_split = line.split()
-            yyyy, mm, day = timestamp2day_pandora(line_split[0])
-            o3_col = float(line_split[38]) * DU_conversion
+        days = pandora_rows_by_day(f, o3_position)
 
-            if yyyy == current_year:
-                if mm == current_month:
-                    if int(day) + 1 == current_day:
-                        daily_data.append([yyyy, mm, day, o3_col])
+    days = {yyyymmdd: np.array(rows) for yyyymmdd, rows in days.items()}
+    dates = np.concatenate(
+        [np.full(len(rows), yyyymmdd) for yyyymmdd, rows in days.items()] or [[]]
+    )
+    rows = np.concatenate(list(days.values()) or [np.empty((0, 4))])
+    save_pandora_sidecar(
+        fname, PANDORA_PRODUCT, "days", lat=lat, lon=lon, dates=dates.astype("U8"), rows=rows
+    )
 
-    return lat, lon, np.array(daily_data)
+    return lat, lon, days
 
 
 def list_epic_L4_tro3(yyyymmdd):
@@ -390,224 +601,114 @@ def timestamp2day_epic(fname):
 def read_DSCOVR_EPIC_L4_O3(fname, lat0, lon0):
     # function read_DSCOVR_EPIC_L4_O3 reads EPIC L4 file supplied with fname and returns total and tropospheric O3 columns
     # in the point of interest supplied by latitude, lat0, and longitude, lon0.
+    # lat0 and lon0 may also be arrays of points of interest, then the columns are arrays of the same shape.
 
-    # Open file.
-    f = h5py.File(fname, "r")
-
-    totO3_col = 0.0
-    tr_O3_col = 0.0
-    if "Latitude" not in f:
-        print("no Latitude dataset in " + fname)
-        return totO3_col, tr_O3_col
-    if "Longitude" not in f:
-        print("no Longitude dataset in " + fname)
-        return totO3_col, tr_O3_col
-    if "TotalColumnOzone" not in f:
-        print("no TotalColumnOzone dataset in " + fname)
-        return totO3_col, tr_O3_col
-    if "TroposphericColumnOzone" not in f:
-        print("no TroposphericColumnOzone dataset in " + fname)
-        return totO3_col, tr_O3_col
-
-    try:
-        lat = np.array(f["Latitude"])
-        lon = np.array(f["Longitude"])
-        totO3 = np.array(f["TotalColumnOzone"])
-        tr_O3 = np.array(f["TroposphericColumnOzone"])
-    except Exception:
-        return totO3_col, tr_O3_col
-
-    f.close()
-
-    i0 = -1
-    j0 = -1
-
-    nlat = len(lat)
-    nlon = len(lon)
-
-    # search for coordinates
-    for i in range(nlat - 1):
-        if lat0 > lat[i] and lat0 < lat[i + 1]:
-            i0 = i
-            break
-
-    for j in range(nlon - 1):
-        if lon0 > lon[j] and lon0 < lon[j + 1]:
-            j0 = j
-            break
-
-    if i0 < 0 or j0 < 0:
-        print(lat0, min(lat), max(lat), lon0, min(lon), max(lon), fname)
-        sys.exit()
-
-    wtSW = (lat[i0 + 1] - lat0) * (lon[j0 + 1] - lon0)  # weight for totO3[i0, j0]
-    wtNW = (lat0 - lat[i0]) * (lon[j0 + 1] - lon0)  # weight for totO3[i0+1, j0]
-    wtSE = (lat[i0 + 1] - lat0) * (lon0 - lon[j0])  # weight for totO3[i0, j0+1]
-    wtNE = (lat0 - lat[i0]) * (lon0 - lon[j0])  # weight for totO3[i0+1, j0+1]
-
-    wt_sum = 0.0
-    if totO3[i0, j0] > 0.0:
-        wt_sum = wt_sum + wtSW
-        totO3_col = totO3_col + wtSW * totO3[i0, j0]
-    if totO3[i0 + 1, j0] > 0.0:
-        wt_sum = wt_sum + wtNW
-        totO3_col = totO3_col + wtNW * totO3[i0 + 1, j0]
-    if totO3[i0, j0 + 1] > 0.0:
-        wt_sum = wt_sum + wtSE
-        totO3_col = totO3_col + wtSE * totO3[i0, j0 + 1]
-    if totO3[i0 + 1, j0 + 1] > 0.0:
-        wt_sum = wt_sum + wtNE
-        totO3_col = totO3_col + wtNE * totO3[i0 + 1, j0 + 1]
-
-    if wt_sum > 0.0:
-        totO3_col = totO3_col / wt_sum
-
-    wt_sum = 0.0
-    if tr_O3[i0, j0] > 0.0:
-        wt_sum = wt_sum + wtSW
-        tr_O3_col = tr_O3_col + wtSW * tr_O3[i0, j0]
-    if tr_O3[i0 + 1, j0] > 0.0:
-        wt_sum = wt_sum + wtNW
-        tr_O3_col = tr_O3_col + wtNW * tr_O3[i0 + 1, j0]
-    if tr_O3[i0, j0 + 1] > 0.0:
-        wt_sum = wt_sum + wtSE
-        tr_O3_col = tr_O3_col + wtSE * tr_O3[i0, j0 + 1]
-    if tr_O3[i0 + 1, j0 + 1] > 0.0:
-        wt_sum = wt_sum + wtNE
-        tr_O3_col = tr_O3_col + wtNE * tr_O3[i0 + 1, j0 + 1]
-
-    if wt_sum > 0.0:
-        tr_O3_col = tr_O3_col / wt_sum
-
-    return totO3_col, tr_O3_col
-
-
-# The code compares ozone columns from DSCOVR EPIC L4 ozone product,
-# Pandora total ozone, and integrated TOLNET clim tropospheric columns.
-# the code is driven by the list of TOLNET clim files.
-#
-# main code begins here.
-#
-# first, read TOLNET clim data files provided as a list in the command line argument.
-# WARNING: providing non clim data, e.g. hirez, will fail the code.
-
-listname = sys.argv[1]  # absolute path/name should be provided here
-
-f = open(listname, "r")
-
-while True:
-    # Get next line from file
-    line = f.readline()
-    if not line:
-        break
-    fname = line[0:-1]
-
-    (lat_int, lon_int, start_time, stop_time, o3_column, tro3_column) = read_tolnet_clim(fname)
-    (yi, mi, di, pdi) = jd2gcal(2400000.5, 51544.0 + start_time)
-    (yf, mf, df, pdf) = jd2gcal(2400000.5, 51544.0 + stop_time)
-    hhi = int(pdi * 24)
-    mmi = int((pdi * 24 - hhi) * 60.0)
-    ssi = ((pdi * 24 - hhi) * 60.0 - mmi) * 60.0
-    hhf = int(pdf * 24)
-    mmf = int((pdf * 24 - hhf) * 60.0)
-    ssf = ((pdf * 24 - hhf) * 60.0 - mmf) * 60.0
-    print(lat_int, lon_int, yi, mi, di, pdi, yf, mf, df, pdf, o3_column, tro3_column)
-
-    # second, create a list of Pandora sites;
-    # find Pandora site in the closest vicinity of TOLNET.
-    #
-    # discovering available Pandora site. please bear in mind that some sites do not have O3 data files
-    print("gathering Pandora sites information")
-    refs = read_pandora_web()
-
-    pandora_site = take_pandora_sites(refs)  # create list of Pandora sites of interest
-    print("the following site was selected")
-    print(pandora_site)
-    print("from the list of existing Pandora sites")
-
-    link = instrument_path(pandora_site)
-    pandora_fname = link[0].split("/")[-1]
-    print(pandora_fname)
-
-    # check if file exists in the local directory, if not download from Pandora site.
-    # Pandora data files are bulky, so it is recommended to keep them if multiple use is intended.
-    # if not, uncomment line 'os.remove(fname)' below and the code will delete files after reading.
-    if not os.path.exists(pandora_fname):
-        print(pandora_fname, " does not exit in local directory, downloading from the web")
-        print(link)
-
-        pandora_fname, response_code = download(link)
-
-        if response_code == 200:
-            print("Pandora L2 file ", pandora_fname, " has been downloaded")
-        else:
-            print("Pandora L2 file ", link, " does not exist")
-            print("program terminated")
-            sys.exit()
-
-    else:
-        print(pandora_fname, " exits in local directory")
-
-    yyyymmdd = str("%4.4i%2.2i%2.2i" % (yi, mi, di))
-    lat, lon, pandora_data = read_pandora_file(pandora_fname, yyyymmdd)
-    print(lat, lon)
-    print(pandora_data)
-
-    # line below can be uncommented if user does not want to keep Pandora files.
-    # this is not recommended as downloading again takes extra time.
-    #  os.remove(fname)
+    # columns are 0 when the file cannot be read
+    lat0, lon0 = np.broadcast_arrays(np.asarray(lat0, dtype=np.float64), lon0)
+    totO3_col = np.zeros(lat0.shape)
+    tr_O3_col = np.zeros(lat0.shape)
 
-    # third, find EPIC L4 data on the same date then read these files. Both total and tropospheric column are to be read
-    # create lists of link of available EPIC L4 files for the month(s) of interest
-    print("gathering lists of EPIC L4 O3 data for selected date")
+    # Open file.
+    with h5py.File(fname, "r") as f:
+        # [()] turns 0-dimensional arrays, for a single point of interest, into numbers
+        if "Latitude" not in f:
+            print("no Latitude dataset in " + fname)
+            return totO3_col[()], tr_O3_col[()]
+        if "Longitude" not in f:
+            print("no Longitude dataset in " + fname)
+            return totO3_col[()], tr_O3_col[()]
+        if "TotalColumnOzone" not in f:
+            print("no TotalColumnOzone dataset in " + fname)
+            return totO3_col[()], tr_O3_col[()]
+        if "TroposphericColumnOzone" not in f:
+            print("no TroposphericColumnOzone dataset in " + fname)
+            return totO3_col[()], tr_O3_col[()]
+
+        try:
+            lat = np.array(f["Latitude"])
+            lon = np.array(f["Longitude"])
+            totO3 = np.array(f["TotalColumnOzone"])
+            tr_O3 = np.array(f["TroposphericColumnOzone"])
+        except Exception:
+            return totO3_col[()], tr_O3_col[()]
+
+    totO3_col, tr_O3_col = bilinear_sample(lat, lon, [totO3, tr_O3], lat0, lon0)
+
+    return totO3_col[()], tr_O3_col[()]
+
+
+def read_epic_day(yyyymmdd, pois):
+    # function read_epic_day lists and downloads every EPIC L4 file of a date once
+    # and interpolates it to all points of interest, given as (latitude, longitude) pairs.
+    # the function returns a dictionary from point of interest to an array of 5 columns:
+    # year, month, fractional day, total and tropospheric ozone columns in DU,
+    # with retrievals of zero total ozone removed.
+    print("gathering lists of EPIC L4 O3 data for ", yyyymmdd)
     epic_links = list_epic_L4_tro3(yyyymmdd)
     for link in epic_links:
         print(link)
-    n_epic_links = len(epic_links)
-
-    # now reading EPIC data and create array EPIC_data
-    array = np.empty(
-        (n_epic_links, 2)
-    )  # second dimension of 2 is for total and tropospheric columns
-    dates = np.empty((n_epic_links, 3))  # second dimension of 3 is for year, mm, day
 
-    cnt = -1
-    for j in range(n_epic_links):
-        url = str(epic_links[j])
-        fname, response_code = download_epic(url)
-        # epic_data_loc is 2D array of EPIC O3 retrievals over Pandora sites returned by function read_DSCOVR_EPIC_L4_O3
-        if response_code == 200:
-            cnt = cnt + 1
-            array[cnt, 0], array[cnt, 1] = read_DSCOVR_EPIC_L4_O3(fname, lat, lon)
-            year, mm, day = timestamp2day_epic(fname)
-            dates[cnt, :] = [year, mm, day]
-            os.remove(fname)
-    epic_data = np.concatenate((dates[0 : cnt + 1, :], array[0 : cnt + 1, 0:2]), axis=1)
-
-    # remove zeroes from EPIC data
-    epic_data_clean = epic_data[epic_data[:, 3] > 0]
-    print(epic_data_clean)
-    #  sys.exit()
-    # plotting diurnal cycles
+    rows = {poi: [] for poi in pois}
+    for url in epic_links:
+        fname, response_code = download_epic(str(url))
+        if response_code != 200:
+            continue
+        year, mm, day = timestamp2day_epic(fname)
+        # all points of interest are interpolated at once
+        totO3_col, tr_O3_col = read_DSCOVR_EPIC_L4_O3(fname, *np.array(pois).reshape(-1, 2).T)
+        for poi, totO3_poi, tr_O3_poi in zip(pois, totO3_col, tr_O3_col):
+            rows[poi].append([year, mm, day, totO3_poi, tr_O3_poi])
+        os.remove(fname)
+
+    epic_data = {}
+    for poi, poi_rows in rows.items():
+        data = np.array(poi_rows).reshape(-1, 5)
+        epic_data[poi] = data[data[:, 3] > 0]
+    return epic_data
+
+
+def clim_date(clim):
+    # function clim_date returns the date stamp yyyymmdd of the first measurement in a TOLNET clim file.
+    return str(mjd2000_to_datetime(clim["start_time"][0]).astype("datetime64[D]")).replace("-", "")
+
+
+def plan_clim_files(clims):
+    # function plan_clim_files groups integrated TOLNET clim files by date and instrument location,
+    # so that everything shared by a group, Pandora data and EPIC files, is read only once.
+    # the function returns a dictionary from (yyyymmdd, (lat, lon)) to a list of clims, sorted by date.
+    groups = {}
+    for clim in clims:
+        if clim is None:
+            continue
+        site = (round(clim["lat"], 4), round(clim["lon"], 4))
+        groups.setdefault((clim_date(clim), site), []).append(clim)
+    return dict(sorted(groups.items()))
+
+
+def plot_columns(pandora_site, yyyymmdd, pandora_data, epic_data, clims):
+    # function plot_columns plots diurnal cycles of total ozone from Pandora, EPIC and TOLNET,
+    # and of tropospheric ozone from EPIC and TOLNET, for one day at one site.
+    # plots are only made when Pandora or EPIC data are available.
     pandora_ndata = len(pandora_data)
-    epic_ndata = len(epic_data_clean)
+    epic_ndata = len(epic_data)
 
-    if epic_ndata > 0 and pandora_ndata > 0:
+    if pandora_ndata > 0 or epic_ndata > 0:
         fig, ax = plt.subplots()
         ax.set_xlim([0, 24])
         ax.set_xticks(np.arange(0, 24, step=3))
-        ax.plot(
-            [(x % 1) * 24 for x in pandora_data[:, 2]], pandora_data[:, 3], linestyle="-", color="c"
-        )
-        ax.plot(
-            [(x % 1) * 24 for x in epic_data_clean[:, 2]],
-            epic_data_clean[:, 3],
-            linestyle="None",
-            marker="*",
-            markersize=8,
-            color="m",
-        )
-        ax.plot([pdi * 24, pdf * 24], [o3_column, o3_column], linestyle="--", color="b")
+        if pandora_ndata > 0:
+            ax.plot((pandora_data[:, 2] % 1) * 24, pandora_data[:, 3], linestyle="-", color="c")
+        if epic_ndata > 0:
+            ax.plot(
+                (epic_data[:, 2] % 1) * 24,
+                epic_data[:, 3],
+                linestyle="None",
+                marker="*",
+                markersize=8,
+                color="m",
+            )
+        for clim in clims:
+            plot_tolnet_columns(ax, clim, "o3_column")
 
         ax.set_xlabel(r"GMT, hour", fontsize=12)
         ax.set_ylabel(r"total O3, DU", fontsize=12)
@@ -617,18 +718,20 @@ while True:
         )
         plt.close()
 
+    if epic_ndata > 0:
         fig, ax = plt.subplots()
         ax.set_xlim([0, 24])
         ax.set_xticks(np.arange(0, 24, step=3))
         ax.plot(
-            [(x % 1) * 24 for x in epic_data_clean[:, 2]],
-            epic_data_clean[:, 4],
+            (epic_data[:, 2] % 1) * 24,
+            epic_data[:, 4],
             linestyle="None",
             marker="*",
             markersize=8,
             color="m",
         )
-        ax.plot([pdi * 24, pdf * 24], [tro3_column, tro3_column], linestyle="--", color="b")
+        for clim in clims:
+            plot_tolnet_columns(ax, clim, "tro3_column")
 
         ax.set_xlabel(r"GMT, hour", fontsize=12)
         ax.set_ylabel(r"tr O3, DU", fontsize=12)
@@ -636,64 +739,86 @@ while True:
         plt.savefig("tr_O3_column_" + pandora_site + "_" + yyyymmdd + ".jpg", format="jpg", dpi=300)
         plt.close()
 
-    if epic_ndata == 0 and pandora_ndata > 0:
-        fig, ax = plt.subplots()
-        ax.set_xlim([0, 24])
-        ax.set_xticks(np.arange(0, 24, step=3))
-        ax.plot(
-            [(x % 1) * 24 for x in pandora_data[:, 2]], pandora_data[:, 3], linestyle="-", color="c"
-        )
-        ax.plot([pdi * 24, pdf * 24], [o3_column, o3_column], linestyle="--", color="b")
 
-        ax.set_xlabel(r"GMT, hour", fontsize=12)
-        ax.set_ylabel(r"total O3, DU", fontsize=12)
-        plt.title("total O3, " + pandora_site + " " + yyyymmdd)
-        plt.savefig(
-            "total_O3_column_" + pandora_site + " " + yyyymmdd + ".jpg", format="jpg", dpi=300
-        )
-        plt.close()
+# The code compares ozone columns from DSCOVR EPIC L4 ozone product,
+# Pandora total ozone, and integrated TOLNET clim tropospheric columns.
+# the code is driven by the list of TOLNET clim files.
+#
+# main code begins here.
+#
 
-    if epic_ndata > 0 and pandora_ndata == 0:
-        fig, ax = plt.subplots()
-        ax.set_xlim([0, 24])
-        ax.set_xticks(np.arange(0, 24, step=3))
-        ax.plot(
-            [(x % 1) * 24 for x in epic_data_clean[:, 2]],
-            epic_data_clean[:, 3],
-            linestyle="None",
-            marker="*",
-            markersize=8,
-            color="m",
-        )
-        ax.plot([pdi * 24, pdf * 24], [o3_column, o3_column], linestyle="--", color="b")
 
-        ax.set_xlabel(r"GMT, hour", fontsize=12)
-        ax.set_ylabel(r"total O3, DU", fontsize=12)
-        plt.title("total O3, " + pandora_site + " " + yyyymmdd)
-        plt.savefig(
-            "total_O3_column_" + pandora_site + " " + yyyymmdd + ".jpg", format="jpg", dpi=300
-        )
-        plt.close()
+def main(listname):
+    # first, read TOLNET clim data files provided as a list in the command line argument.
+    # all files are read and integrated up front, in parallel processes,
+    # then grouped by date and instrument location.
+    # WARNING: providing non clim data, e.g. hirez, will fail the code.
+    with open(listname, "r") as f:
+        fnames = [line.strip() for line in f if line.strip()]
 
-        fig, ax = plt.subplots()
-        ax.set_xlim([0, 24])
-        ax.set_xticks(np.arange(0, 24, step=3))
-        ax.plot(
-            [(x % 1) * 24 for x in epic_data_clean[:, 2]],
-            epic_data_clean[:, 4],
-            linestyle="None",
-            marker="*",
-            markersize=8,
-            color="m",
-        )
-        ax.plot([pdi * 24, pdf * 24], [tro3_column, tro3_column], linestyle="--", color="b")
+    plan = plan_clim_files(integrate_tolnet_clim_files(fnames))
+    for (yyyymmdd, site), clims in plan.items():
+        print(yyyymmdd, site, [clim["fname"] for clim in clims])
 
-        ax.set_xlabel(r"GMT, hour", fontsize=12)
-        ax.set_ylabel(r"tr O3, DU", fontsize=12)
-        plt.title("tropospheric O3 column, " + pandora_site + " " + yyyymmdd)
-        plt.savefig("tr_O3_column_" + pandora_site + "_" + yyyymmdd + ".jpg", format="jpg", dpi=300)
-        plt.close()
+    # second, select a Pandora site for each TOLNET location; the Pandora site index is crawled once.
+    # discovering available Pandora site. please bear in mind that some sites do not have O3 data files
+    print("gathering Pandora sites information")
+    refs = read_pandora_web()
+
+    pandora = {}
+    for site in sorted({site for _, site in plan}):
+        print("TOLNET location ", site)
+        pandora_site = take_pandora_sites(refs)  # create list of Pandora sites of interest
+        print("the following site was selected")
+        print(pandora_site)
+        print("from the list of existing Pandora sites")
+
+        link = instrument_path(pandora_site)
+        pandora_fname = link[0].split("/")[-1]
+        print(pandora_fname)
+
+        # check if file exists in the local directory, if not download from Pandora site.
+        # Pandora data files are bulky, so it is recommended to keep them if multiple use is intended.
+        if not os.path.exists(pandora_fname):
+            print(pandora_fname, " does not exit in local directory, downloading from the web")
+            print(link)
+
+            pandora_fname, response_code = download(link[0])
+
+            if response_code == 200:
+                print("Pandora L2 file ", pandora_fname, " has been downloaded")
+            else:
+                print("Pandora L2 file ", link, " does not exist")
+                print("program terminated")
+                sys.exit()
+
+        else:
+            print(pandora_fname, " exits in local directory")
+
+        # only the days of the dates at this location are read from the Pandora file, shared by all of them.
+        dates = [yyyymmdd for yyyymmdd, location in plan if location == site]
+        lat, lon, days = read_pandora_dates(pandora_fname, dates)
+        print(lat, lon)
+        pandora[site] = (pandora_site, (lat, lon), days)
+
+    # third, find EPIC L4 data on each date then read these files once for all Pandora sites of the date.
+    # Both total and tropospheric column are to be read
+    for yyyymmdd in sorted({yyyymmdd for yyyymmdd, _ in plan}):
+        sites = [site for date, site in plan if date == yyyymmdd]
+        epic_data = read_epic_day(yyyymmdd, sorted({pandora[site][1] for site in sites}))
+
+        for site in sites:
+            pandora_site, poi, days = pandora[site]
+            pandora_data = days.get(yyyymmdd, np.empty((0, 4)))
+            print(pandora_site, yyyymmdd)
+            print(pandora_data)
+            print(epic_data[poi])
+
+            # plotting diurnal cycles
+            plot_columns(
+                pandora_site, yyyymmdd, pandora_data, epic_data[poi], plan[(yyyymmdd, site)]
+            )
 
-f.close()
 
-sys.exit()
+if __name__ == "__main__":
+    main(sys.argv[1])  # absolute path/name should be provided here
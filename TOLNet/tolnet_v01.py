@@ -5,9 +5,23 @@ Created on Tue Nov 28 13:32:30 2023
 @author: Maurice Roots, Arthur Perng, John T. Sullivan
 """
 
+import os
+import gzip
+import zlib
+import json
+import functools
+import sqlite3
+import threading
+import contextlib
+import random
+from time import perf_counter, sleep
+from pathlib import Path
+
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import numpy as np
+import xarray as xr
 import datetime
 
 import matplotlib as mpl
@@ -15,11 +29,15 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.units as munits
 
-from dateutil import tz
-
 from tqdm import tqdm
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 
 # %% Function Space
 
@@ -81,18 +99,799 @@ class filter_files:
             pass
         return self
 
+    def latest_revision(self, latest_only: bool = True, **kwargs):
+        """
+        Keeps only the newest revision, and of those the latest upload, of each
+        measurement: files sharing an instrument group, start time, product type and
+        processing type.
+        """
+        try:
+            if latest_only:
+                self.df = self.df.sort_values(
+                    ["revision", "upload_date"], kind="stable"
+                ).drop_duplicates(
+                    [
+                        "instrument_group_id",
+                        "start_data_date",
+                        "product_type_id",
+                        "processing_type_name",
+                    ],
+                    keep="last",
+                )
+                self.df = self.df.sort_index()
+        except Exception:
+            pass
+        return self
+
+
+class file_cache:
+    """
+    A size-capped, on-disk cache of TOLNet JSON payloads.
+
+    Each payload is stored gzip-compressed under a name built from the file id, its
+    revision and its upload date, so a revised or re-uploaded file gets a new entry and
+    the superseded one simply ages out. Reading an entry marks it as recently used; once
+    the cache grows past max_size_mb the least recently used entries are deleted. The size
+    of the cache on disk is only measured on the first put, so opening a large cache is cheap.
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=2048):
+        if cache_dir is None:
+            cache_dir = Path.home() / ".cache" / "tolnet"
+        self.path = Path(cache_dir) / "files"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size_mb * 1024**2
+        self.lock = threading.Lock()
+        self.size = None  # measured by the first put, see _entries
+        return
+
+    def _entry(self, file_id, revision, upload_date):
+        stamp = "na"
+        if upload_date is not None and not pd.isna(upload_date):
+            stamp = pd.Timestamp(upload_date).strftime("%Y%m%dT%H%M%S")
+        return self.path / f"{file_id}_r{revision}_{stamp}.json.gz"
+
+    def get(self, file_id, revision=None, upload_date=None):
+        """
+        Returns the cached payload of a file as a dictionary, or None on a cache miss.
+        An entry that cannot be decoded is deleted and counts as a miss.
+        """
+        entry = self._entry(file_id, revision, upload_date)
+        try:
+            content = entry.read_bytes()
+        except OSError:
+            return None
+
+        try:
+            payload = json.loads(gzip.decompress(content))
+        except (OSError, EOFError, ValueError, zlib.error):
+            # A truncated or corrupt entry is dropped, so the next download replaces it.
+            with contextlib.suppress(OSError):
+                entry.unlink()
+                with self.lock:
+                    if self.size is not None:
+                        self.size -= len(content)
+            return None
+
+        with contextlib.suppress(OSError):
+            os.utime(entry)
+        return payload
+
+    def put(self, file_id, revision, upload_date, content: bytes):
+        """
+        Stores the raw JSON bytes of a file, then evicts the least recently used entries
+        while the cache is over its size cap.
+        """
+        entry = self._entry(file_id, revision, upload_date)
+        compressed = gzip.compress(content, compresslevel=6)
+        partial = entry.with_name(f"{entry.name}.{threading.get_ident()}.part")
+        partial.write_bytes(compressed)
+        os.replace(partial, entry)
+
+        with self.lock:
+            if self.size is None:
+                # the entry just written is on disk, so it is counted by the scan
+                self.size = sum(size for _, size, _ in self._entries())
+            else:
+                self.size += len(compressed)
+            if self.size > self.max_size:
+                self._evict()
+        return
+
+    def _entries(self):
+        """
+        Returns (modification time, size, path) of every cache entry, least recently used first.
+        """
+        entries = []
+        for path in self.path.glob("*.json.gz"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._entries()
+        self.size = sum(size for _, size, _ in entries)
+        target = 0.9 * self.max_size
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            try:
+                path.unlink()
+                self.size -= size
+            except OSError:
+                pass
+        return
+
+
+class file_catalog:
+    """
+    A local SQLite copy of the TOLNet file catalog.
+
+    Files are stored one row per id with indexes on the columns import_data filters on,
+    so repeated queries are answered from disk. The days whose catalog has been pulled are
+    recorded with the time of the pull, and a day is requested again once its sync is older
+    than the refresh interval. Days synced more than settle_days after their date rarely
+    change, so they are given the longer settled_ttl, which still lets revisions uploaded
+    later for old campaigns show up. A row is only replaced by a newer upload of the same
+    file.
+    """
+
+    indexed = [
+        "start_data_date",
+        "instrument_group_id",
+        "product_type_id",
+        "file_type_id",
+        "processing_type_name",
+    ]
+
+    def __init__(self, cache_dir, dtypes: dict, settle_days=30, settled_ttl=7 * 86400):
+        self.path = Path(cache_dir) / "catalog.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.dtypes = dtypes
+        self.columns = list(dtypes.keys())
+        self.settle_days = settle_days
+        self.settled_ttl = settled_ttl
+        self.lock = threading.Lock()
+
+        sql_types = {"int16": "INTEGER", "bool": "INTEGER"}
+        fields = ", ".join(
+            f'"{name}" {sql_types.get(dtype, "TEXT")}' + (" PRIMARY KEY" if name == "id" else "")
+            for name, dtype in dtypes.items()
+        )
+        with self._connect() as connection:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS files ({fields})")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS synced (day TEXT PRIMARY KEY, synced_at REAL)"
+            )
+            for name in self.indexed:
+                connection.execute(f'CREATE INDEX IF NOT EXISTS "ix_{name}" ON files ("{name}")')
+        return
+
+    def _connect(self):
+        return contextlib.closing(sqlite3.connect(self.path, timeout=30))
+
+    def stale_ranges(self, min_date, max_date, ttl):
+        """
+        Returns the (start, end) date strings of each run of consecutive days between
+        min_date and max_date whose catalog needs to be pulled from the API.
+        """
+        days = pd.date_range(pd.Timestamp(min_date).floor("D"), pd.Timestamp(max_date).floor("D"))
+        with self._connect() as connection:
+            synced = (
+                dict(
+                    connection.execute(
+                        "SELECT day, synced_at FROM synced WHERE day BETWEEN ? AND ?",
+                        (days[0].strftime("%Y-%m-%d"), days[-1].strftime("%Y-%m-%d")),
+                    ).fetchall()
+                )
+                if len(days)
+                else {}
+            )
+
+        now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        stale = []
+        for day in days:
+            synced_at = synced.get(day.strftime("%Y-%m-%d"))
+            settled = synced_at is not None and (
+                synced_at - day.tz_localize("UTC").timestamp() > self.settle_days * 86400
+            )
+            if synced_at is None or now - synced_at > (self.settled_ttl if settled else ttl):
+                stale.append(day)
+
+        ranges = []
+        for day in stale:
+            if ranges and (day - ranges[-1][1]).days == 1:
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        return [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")) for start, end in ranges]
+
+    def update(self, files: pd.DataFrame, min_date=None, max_date=None):
+        """
+        Stores the rows of a catalog DataFrame, keeping the most recent upload of each
+        file. When min_date and max_date are given the days between them are marked as
+        synced.
+        """
+        columns = [name for name in self.columns if name in files.columns]
+        values = []
+        for name in columns:
+            column = files[name]
+            if self.dtypes[name] == "datetime64[ns]":
+                text = column.dt.strftime("%Y-%m-%d %H:%M:%S")
+                values.append(text.astype(object).where(column.notna(), None).tolist())
+            elif self.dtypes[name] in ("int16", "bool"):
+                values.append(column.astype("int64").tolist())
+            else:
+                values.append(column.astype(object).where(column.notna(), None).tolist())
+        rows = list(zip(*values))
+
+        quoted = ", ".join(f'"{name}"' for name in columns)
+        updates = ", ".join(f'"{name}" = excluded."{name}"' for name in columns if name != "id")
+        statement = (
+            f"INSERT INTO files ({quoted}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates} "
+            "WHERE excluded.upload_date > files.upload_date OR files.upload_date IS NULL"
+        )
+
+        with self.lock, self._connect() as connection, connection:
+            if rows:
+                connection.executemany(statement, rows)
+            if min_date is not None and max_date is not None:
+                now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO synced (day, synced_at) VALUES (?, ?)",
+                    [
+                        (day.strftime("%Y-%m-%d"), now)
+                        for day in pd.date_range(
+                            pd.Timestamp(min_date).floor("D"), pd.Timestamp(max_date).floor("D")
+                        )
+                    ],
+                )
+        return
+
+    def query(
+        self,
+        min_date,
+        max_date,
+        instrument_group: list = None,
+        product_type: list = None,
+        file_type: list = None,
+        processing_type_name: list = None,
+    ):
+        """
+        Returns a dictionary of column lists for the files starting between min_date and
+        the end of max_date that match every filter given.
+        """
+        end = (pd.Timestamp(max_date).floor("D") + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        clauses = ["start_data_date >= ?", "start_data_date < ?"]
+        arguments = [pd.Timestamp(min_date).strftime("%Y-%m-%d %H:%M:%S"), end]
+        for name, selection in (
+            ("instrument_group_id", instrument_group),
+            ("product_type_id", product_type),
+            ("file_type_id", file_type),
+            ("processing_type_name", processing_type_name),
+        ):
+            if selection is not None:
+                clauses.append(f'"{name}" IN ({", ".join("?" * len(selection))})')
+                arguments += list(selection)
+
+        quoted = ", ".join(f'"{name}"' for name in self.columns)
+        statement = (
+            f"SELECT {quoted} FROM files WHERE {' AND '.join(clauses)} "
+            "ORDER BY start_data_date DESC"
+        )
+        with self._connect() as connection:
+            rows = connection.execute(statement, arguments).fetchall()
+
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(self.columns)}
+        for name, dtype in self.dtypes.items():
+            if dtype == "bool":
+                columns[name] = [bool(value) for value in columns[name]]
+        return columns
+
+
+class curtain_store:
+    """
+    The consolidated time x altitude ozone curtain of one site.
+
+    Profiles are appended as files arrive and merged lazily, the first time the curtain
+    is read after new data: all profiles are placed on the union of their altitude grids
+    (missing levels are NaN), sorted by time, and a profile repeated by a later import
+    replaces the earlier one. Times are kept as UTC nanoseconds.
+    """
+
+    def __init__(self, attrs: dict = None, dtype="float64"):
+        self.attrs = dict(attrs or {})
+        self.dtype = np.dtype(dtype)
+        self.times = np.empty(0, dtype="int64")
+        self.altitude = np.empty(0, dtype=np.float64)
+        self.values = np.empty((0, 0), dtype=self.dtype)
+        self.pending = []
+        self.native_cadence = None
+        return
+
+    def __len__(self):
+        return len(self.times) + sum(len(times) for times, _, _ in self.pending)
+
+    def add(self, data: pd.DataFrame):
+        """
+        Appends a profile DataFrame, indexed by time with one column per altitude.
+        """
+        times = pd.DatetimeIndex(data.index)
+        times = times.tz_localize("UTC") if times.tz is None else times.tz_convert("UTC")
+        self.pending.append(
+            (
+                times.asi8,
+                np.asarray(data.columns, dtype=np.float64),
+                data.to_numpy(dtype=self.dtype),
+            )
+        )
+        self.native_cadence = None
+        return self
+
+    def _consolidate(self):
+        if not self.pending:
+            return
+
+        chunks = [(self.times, self.altitude, self.values), *self.pending]
+        altitude = np.unique(np.concatenate([chunk[1] for chunk in chunks]))
+        times = np.concatenate([chunk[0] for chunk in chunks])
+
+        values = np.full((len(times), len(altitude)), np.nan, dtype=self.dtype)
+        row = 0
+        for chunk_times, chunk_altitude, chunk_values in chunks:
+            rows = slice(row, row + len(chunk_times))
+            values[rows, np.searchsorted(altitude, chunk_altitude)] = chunk_values
+            row += len(chunk_times)
+
+        # Keep the last copy of every time step; np.unique also sorts the time axis.
+        _, last = np.unique(times[::-1], return_index=True)
+        keep = len(times) - 1 - last
+
+        self.times = times[keep]
+        self.altitude = altitude
+        self.values = values[keep]
+        self.pending = []
+        return
+
+    def frame(self, timezone="UTC"):
+        """
+        Returns the curtain as a DataFrame indexed by time in the given timezone, with one
+        column per altitude. The DataFrame shares memory with the store.
+        """
+        self._consolidate()
+        index = pd.DatetimeIndex(self.times, tz="UTC").tz_convert(timezone)
+        return pd.DataFrame(self.values, index=index, columns=self.altitude, copy=False)
+
+    def cadence(self):
+        """
+        Returns the native time step of the curtain in whole seconds: the most common
+        positive spacing between consecutive profiles, which is robust to gaps between
+        files and to jitter in individual time stamps. The result is cached until new
+        profiles are added.
+        """
+        self._consolidate()
+        if self.native_cadence is None:
+            steps = np.diff(self.times)
+            steps = np.rint(steps[steps > 0] / 1e9).astype("int64")
+            if len(steps) == 0:
+                self.native_cadence = 60
+            else:
+                values, counts = np.unique(steps, return_counts=True)
+                self.native_cadence = max(int(values[np.argmax(counts)]), 1)
+        return self.native_cadence
+
+    def time_range(self):
+        """
+        Returns the first and last time of the curtain as UTC numpy datetimes.
+        """
+        self._consolidate()
+        first, last = self.times[[0, -1]].astype("datetime64[ns]")
+        return first, last
+
+    def to_dataset(self):
+        """
+        Returns the curtain as an xarray Dataset with an "ozone" (time, altitude) variable.
+        """
+        self._consolidate()
+        return xr.Dataset(
+            {"ozone": (("time", "altitude"), self.values)},
+            coords={"time": self.times.astype("datetime64[ns]"), "altitude": self.altitude},
+            attrs={**self.attrs, "timezone": "UTC"},
+        )
+
+    def save(self, path):
+        """
+        Writes the curtain to a NetCDF file, or to a Zarr store if path ends in ".zarr".
+        """
+        if str(path).endswith(".zarr"):
+            self.to_dataset().to_zarr(path, mode="w")
+        else:
+            self.to_dataset().to_netcdf(path)
+        return
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a curtain written by save.
+        """
+        if str(path).endswith(".zarr"):
+            ds = xr.open_zarr(path)
+        else:
+            ds = xr.open_dataset(path)
+
+        with ds:
+            attrs = {key: value for key, value in ds.attrs.items() if key != "timezone"}
+            store = cls(attrs, ds["ozone"].dtype)
+            store.times = ds["time"].values.astype("datetime64[ns]").astype("int64")
+            store.altitude = ds["altitude"].values.astype(np.float64)
+            store.values = np.ascontiguousarray(ds["ozone"].values)
+        return store
+
+
+class geos_cf_store:
+    """
+    The GEOS-CF ozone and layer heights at one location.
+
+    Both are (time, level) float32 arrays that share a single time vector of UTC
+    nanoseconds, with levels in ascending order. Days are appended in place into buffers
+    that grow geometrically, so adding a day does not copy the days already stored, and
+    the rows are sorted by time only when the arrays are read.
+    """
+
+    def __init__(self, levels=72):
+        self.size = 0
+        self.times = np.empty(0, dtype="int64")
+        self.ozone = np.empty((0, levels), dtype=np.float32)
+        self.height = np.empty((0, levels), dtype=np.float32)
+        self.days = set()
+        self.ordered = True
+        return
+
+    def __contains__(self, day):
+        return day in self.days
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, day, time, ozone, height):
+        """
+        Appends one day of times (UTC nanoseconds) and (time, level) ozone and height arrays.
+        """
+        n = len(time)
+        if self.size + n > len(self.times):
+            capacity = max(2 * len(self.times), self.size + n)
+            for name in ("times", "ozone", "height"):
+                old = getattr(self, name)
+                new = np.empty((capacity, *old.shape[1:]), dtype=old.dtype)
+                new[: self.size] = old[: self.size]
+                setattr(self, name, new)
+
+        if self.size and time[0] < self.times[self.size - 1]:
+            self.ordered = False
+
+        rows = slice(self.size, self.size + n)
+        self.times[rows] = time
+        self.ozone[rows] = ozone
+        self.height[rows] = height
+        self.size += n
+        self.days.add(day)
+        return self
+
+    def arrays(self):
+        """
+        Returns views of the time vector and the ozone and height arrays, sorted by time.
+        """
+        if not self.ordered:
+            order = np.argsort(self.times[: self.size], kind="stable")
+            self.times[: self.size] = self.times[: self.size][order]
+            self.ozone[: self.size] = self.ozone[: self.size][order]
+            self.height[: self.size] = self.height[: self.size][order]
+            self.ordered = True
+
+        rows = slice(0, self.size)
+        return self.times[rows], self.ozone[rows], self.height[rows]
+
+
+class rate_limiter:
+    """
+    A token bucket shared by every thread of a client. Tokens refill at rate per second up
+    to burst; each request takes one, waiting for it if the bucket is empty. A rate of
+    None disables the limit.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.tokens = self.burst
+        self.updated = perf_counter()
+        self.lock = threading.Lock()
+        return
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = perf_counter()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            sleep(wait_time)
+
+
+class request_log:
+    """
+    A thread-safe record of every HTTP request made by a client.
+
+    Each request is stored as a dictionary holding the endpoint it belongs to (for example
+    "file", "catalog" or "geos_cf"), its URL, HTTP status, latency, response size, number
+    of retries, the time spent decoding the JSON body and any error. summary() condenses
+    them per endpoint into counts, latency percentiles and throughput.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+        return
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(
+        self,
+        endpoint,
+        url,
+        status=None,
+        seconds=0.0,
+        size=0,
+        retries=0,
+        decode_seconds=0.0,
+        error=None,
+    ):
+        entry = {
+            "endpoint": endpoint,
+            "url": url,
+            "status": status,
+            "start": datetime.datetime.now(datetime.timezone.utc).timestamp() - seconds,
+            "seconds": seconds,
+            "bytes": size,
+            "retries": retries,
+            "decode_seconds": decode_seconds,
+            "error": error,
+        }
+        with self.lock:
+            self.records.append(entry)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.records = []
+        return self
+
+    def summary(self):
+        """
+        Returns
+        -------
+        A dictionary keyed by endpoint, plus "all", giving the number of requests and
+        errors, the retries, the p50 and p95 of the request latency and decode time in
+        seconds, the megabytes received, and the requests and megabytes per second over
+        the span from the first request starting to the last one finishing.
+        """
+        with self.lock:
+            records = list(self.records)
+
+        groups = {"all": records}
+        for entry in records:
+            groups.setdefault(entry["endpoint"], []).append(entry)
+
+        summary = {}
+        for endpoint, entries in groups.items():
+            if not entries:
+                continue
+            seconds = np.array([entry["seconds"] for entry in entries])
+            decode = np.array([entry["decode_seconds"] for entry in entries])
+            starts = np.array([entry["start"] for entry in entries])
+            span = float(np.max(starts + seconds) - np.min(starts)) or float("nan")
+            megabytes = sum(entry["bytes"] or 0 for entry in entries) / 1024**2
+
+            summary[endpoint] = {
+                "requests": len(entries),
+                "errors": sum(
+                    entry["error"] is not None or (entry["status"] or 0) >= 400 for entry in entries
+                ),
+                "retries": sum(entry["retries"] for entry in entries),
+                "latency_p50": float(np.percentile(seconds, 50)),
+                "latency_p95": float(np.percentile(seconds, 95)),
+                "decode_p50": float(np.percentile(decode, 50)),
+                "decode_p95": float(np.percentile(decode, 95)),
+                "megabytes": megabytes,
+                "requests_per_second": len(entries) / span,
+                "megabytes_per_second": megabytes / span,
+            }
+        return summary
+
+    def to_json(self, path=None, records=True):
+        """
+        Returns the summary, and unless records is False every request, as a JSON string,
+        also writing it to path when one is given.
+        """
+        with self.lock:
+            output = {"summary": None, "records": list(self.records) if records else None}
+        output["summary"] = self.summary()
+        text = json.dumps(output, indent=2)
+        if path is not None:
+            Path(path).write_text(text)
+        return text
+
 
 class utilities:
     def __init__(self):
         self.data = {}
         self.troubleshoot = {}
+        self.session = None
+        self.max_connections = 10
+        self.request_log = request_log()
+        self.max_retries = 4
+        self.backoff = 0.5
+        self.max_backoff = 30.0
+        self.timeout = 120
+        self.rate_limiter = rate_limiter()
         return
 
-    def O3_curtain_colors(self):
+    def _open_session(self, max_connections: int = None):
         """
+        Parameters
+        ----------
+        max_connections : INT, optional
+            The maximum number of connections kept open to a single host. Defaults to the
+            size of the current pool.
+
         Returns
         -------
-        The color scheme used in the O3 curtain plots on the TOLNet website.
+        A requests.Session shared by all download threads. Connections are kept alive
+        between requests, and threads wait for a free connection instead of opening more
+        than max_connections sockets to the same host. The session is rebuilt only when
+        the pool size changes.
+        """
+        if max_connections is None:
+            max_connections = self.max_connections
+
+        if self.session is None or max_connections != self.max_connections:
+            if self.session is not None:
+                self.session.close()
+
+            adapter = HTTPAdapter(
+                pool_connections=10, pool_maxsize=max_connections, pool_block=True
+            )
+            self.session = requests.Session()
+            self.session.headers.update({"Connection": "keep-alive"})
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            self.max_connections = max_connections
+
+        return self.session
+
+    # HTTP statuses worth retrying: rate limited, or a transient server or gateway error.
+    retry_statuses = {429, 500, 502, 503, 504}
+
+    def set_rate_limit(self, rate=None, burst=None):
+        """
+        Parameters
+        ----------
+        rate : FLOAT, optional
+            The maximum sustained number of requests per second across all threads.
+            Defaults to None, no limit.
+        burst : INT, optional
+            The number of requests that may be sent at once after an idle period.
+            Defaults to max(1, rate).
+
+        Returns
+        -------
+        A reference to the object.
+        """
+        self.rate_limiter = rate_limiter(rate, burst)
+        return self
+
+    def _retry_delay(self, attempt, response=None):
+        """
+        Returns the seconds to wait before retry number attempt (from 1): the server's
+        Retry-After when it sends one, otherwise an exponential backoff with full jitter.
+        """
+        if response is not None:
+            try:
+                return min(self.max_backoff, float(response.headers["Retry-After"]))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _request(self, url, endpoint):
+        """
+        Parameters
+        ----------
+        url : STR
+            The URL to GET through the shared session.
+        endpoint : STR
+            The name the request is logged under in self.request_log.
+
+        Returns
+        -------
+        The response and its decoded JSON body, or None as the body when the final status
+        is not 200. Every request first waits for the rate limiter. Connection errors,
+        timeouts and the statuses in retry_statuses are retried up to max_retries times
+        with exponential backoff and jitter; the last error is raised if they all fail.
+        The latency, size, status, retries and decode time are added to self.request_log,
+        including for requests that raise.
+        """
+        start = perf_counter()
+        response, seconds, decode_start = None, None, None
+        retries = 0
+        try:
+            while True:
+                self.rate_limiter.acquire()
+                try:
+                    response = self._open_session().get(url, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    if retries >= self.max_retries:
+                        raise
+                    response = None
+                else:
+                    if (
+                        response.status_code not in self.retry_statuses
+                        or retries >= self.max_retries
+                    ):
+                        break
+                retries += 1
+                sleep(self._retry_delay(retries, response))
+
+            seconds = perf_counter() - start
+            if response.status_code != 200:
+                self.request_log.record(
+                    endpoint, url, response.status_code, seconds, len(response.content), retries
+                )
+                return response, None
+
+            decode_start = perf_counter()
+            payload = response.json()
+        except Exception as e:
+            now = perf_counter()
+            self.request_log.record(
+                endpoint,
+                url,
+                status=response.status_code if response is not None else None,
+                seconds=seconds if seconds is not None else now - start,
+                size=len(response.content) if response is not None else 0,
+                retries=retries,
+                decode_seconds=now - decode_start if decode_start is not None else 0.0,
+                error=f"{type(e).__name__}: {e}",
+            )
+            raise
+
+        self.request_log.record(
+            endpoint,
+            url,
+            response.status_code,
+            seconds,
+            len(response.content),
+            retries,
+            decode_seconds=perf_counter() - decode_start,
+        )
+        return response, payload
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def O3_curtain_colors():
+        """
+        Returns
+        -------
+        The color scheme used in the O3 curtain plots on the TOLNet website. The colormap
+        and norm are built once per process and shared by every plot.
 
         """
         ncolors = [
@@ -153,6 +952,7 @@ class utilities:
             "cbar_label": "Ozone ($ppb_v$)",
             "fontsize_cbar": 16,
             "grid": True,  # Add a parameter for grid
+            "show": True,
         }
 
         params.update(kwargs)
@@ -161,7 +961,6 @@ class utilities:
 
         if use_countourf:
             # Plotting
-            ncmap, nnorm = self.O3_curtain_colors()
             levels = nnorm.boundaries  # Use the same boundaries as for pcolormesh
             im = ax.contourf(X, Y, Z, levels=levels, cmap=ncmap, norm=nnorm)
 
@@ -200,7 +999,10 @@ class utilities:
         if params["savename"]:
             plt.savefig(params["savename"], dpi=350)
 
-        plt.show()
+        if params["show"]:
+            plt.show()
+        else:
+            plt.close(fig)
 
         return
 
@@ -208,13 +1010,24 @@ class utilities:
 class GEOS_CF(utilities):
     # https://dphttpdev01.nccs.nasa.gov/data-services/cfapi/assim/chm/v72/O3/39x-77/20230808/20230811
     # https://dphttpdev01.nccs.nasa.gov/data-services/cfapi/assim/met/v72/MET/39x-77/20230808/20230811
-    def __init__(self, internal=True):
+
+    def __init__(self, internal=True, cache_dir=None):
+        """
+        Parameters
+        ----------
+        internal : BOOL, optional
+            Use the public fluid.nccs.nasa.gov API (default) or the development server.
+        cache_dir : STR, optional
+            A directory where daily GEOS-CF responses are cached, so that reruns over the
+            same days and locations do not query the API again. Defaults to no caching.
+        """
         super().__init__()
         if internal is False:
             self.base_url = r"https://dphttpdev01.nccs.nasa.gov/data-services"
         else:
             self.base_url = r"https://fluid.nccs.nasa.gov/cfapi"
 
+        self.geos_cache = Path(cache_dir) / "geos_cf" if cache_dir else None
         self.data[("GEOS_CF", "Replay")] = {}
         self.troubleshoot["GEOS_CF"] = []
         return
@@ -227,35 +1040,143 @@ class GEOS_CF(utilities):
             f"{self.base_url}/{collection}/met/v72/{molecule}/{lat_lon}/{date_start}/{date_end}"
         )
 
-        ozone_response = requests.get(ozone_query).json()
-        met_response = requests.get(heights_query).json()
+        _, ozone_response = self._request(ozone_query, "geos_cf")
+        _, met_response = self._request(heights_query, "geos_cf")
+        data = self._geos_arrays(ozone_response, met_response)
+
+        return (ozone_response, met_response), (date_start, date_end), data
+
+    @staticmethod
+    def _geos_arrays(ozone_response, met_response):
+        """
+        Returns the times of a response as UTC nanoseconds, and its ozone and layer heights
+        as (time, level) float32 arrays with levels in ascending order.
+        """
         times = pd.to_datetime(ozone_response["time"], utc=True, format="%Y-%m-%dT%H:%M:%S")
 
-        ozone = pd.DataFrame(ozone_response["values"]["O3"], index=times)
-        ozone.columns = pd.to_numeric(ozone.columns)
-        ozone.sort_index(axis=1, inplace=True)
+        ozone = ozone_response["values"]["O3"]
+        heights = met_response["values"]["ZL"]
+        levels = sorted(ozone, key=float)
 
-        heights = pd.DataFrame(met_response["values"]["ZL"], index=times)
-        heights.columns = pd.to_numeric(heights.columns)
-        heights.sort_index(axis=1, inplace=True)
+        return {
+            "time": times.asi8,
+            "ozone": np.array([ozone[level] for level in levels], dtype=np.float32).T,
+            "height": np.array([heights[level] for level in levels], dtype=np.float32).T,
+        }
 
-        times = np.tile(times, (72, 1))
-        data = {"height": heights, "ozone": ozone, "time": times.T}
+    @staticmethod
+    def _split_by_day(response, variable):
+        """
+        Splits a GEOS-CF response covering several days into one response per day,
+        keyed by YYYYMMDD.
+        """
+        rows = {}
+        for i, time in enumerate(response["time"]):
+            rows.setdefault(time[:10].replace("-", ""), []).append(i)
+
+        levels = response["values"][variable]
+        return {
+            day: {
+                "time": [response["time"][i] for i in index],
+                "values": {
+                    variable: {
+                        level: [values[i] for i in index] for level, values in levels.items()
+                    }
+                },
+            }
+            for day, index in rows.items()
+        }
 
-        return (ozone_response, met_response), (date_start, date_end), data
+    def _geos_cache_entry(self, lat_lon, day, collection, molecule):
+        return self.geos_cache / f"{collection}_{molecule}_{lat_lon}_{day}.json.gz"
 
-    def get_geos_data_multithreaded(self, lat_lon, start_date, end_date):
-        def fetch_geos_data_for_date(self, lat_lon, date):
-            date_str = date.strftime("%Y%m%d")
-            return self._get_geos_data(lat_lon, date_str, date_str)
+    def _fetch_geos_chunk(self, lat_lon, days, collection="assim", molecule="O3"):
+        """
+        Requests a run of consecutive days in one query and returns the per-day
+        (ozone, met) responses. Days that are complete are written to the cache.
+        """
+        response, _, _ = self._get_geos_data(lat_lon, days[0], days[-1], collection, molecule)
+        ozone = self._split_by_day(response[0], "O3")
+        met = self._split_by_day(response[1], "ZL")
+
+        # The last couple of days may still be filled in by the model, so they are not cached.
+        recent = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=2)).strftime("%Y%m%d")
+        responses = {}
+        for day in days:
+            if day not in ozone or day not in met:
+                continue
+            responses[day] = (ozone[day], met[day])
+            if self.geos_cache is not None and day < recent:
+                entry = self._geos_cache_entry(lat_lon, day, collection, molecule)
+                entry.parent.mkdir(parents=True, exist_ok=True)
+                entry.write_bytes(gzip.compress(json.dumps(responses[day]).encode()))
+        return responses
+
+    def get_geos_data_multithreaded(
+        self, lat_lon, start_date, end_date, max_workers=4, max_chunk_days=31
+    ):
+        """
+        Parameters
+        ----------
+        lat_lon : STR
+            The location to query, formatted as {latitude}x{longitude}.
+        start_date : STR
+            The first day to retrieve, formatted as YYYY-MM-DD.
+        end_date : STR
+            The last day to retrieve, formatted as YYYY-MM-DD.
+        max_workers : INT, optional
+            The number of queries sent concurrently. Defaults to 4.
+        max_chunk_days : INT, optional
+            The longest run of consecutive days requested in a single query. Longer runs
+            mean fewer queries but larger responses, and fewer runs to spread over the
+            workers. Defaults to 31, one month of hourly data.
 
-        date_range = pd.date_range(start=start_date, end=end_date)
+        Returns
+        -------
+        A reference to the object, with the days added to the geos_cf_store in
+        self.data[("GEOS_CF", "Replay", lat_lon)]. Days already loaded for this location are
+        skipped, cached days are read from disk, and the remaining days are requested in
+        runs of up to max_chunk_days per query.
+        """
+        key = ("GEOS_CF", "Replay", f"{lat_lon}")
+        if key not in self.data.keys():
+            self.data[key] = geos_cf_store()
+        store = self.data[key]
+
+        days = [
+            date.strftime("%Y%m%d")
+            for date in pd.date_range(start=start_date, end=end_date)
+            if date.strftime("%Y%m%d") not in store
+        ]
 
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            futures = [
-                executor.submit(fetch_geos_data_for_date, self, lat_lon, date)
-                for date in date_range
-            ]
+        if self.geos_cache is None:
+            missing = days
+        else:
+            missing = []
+            for day in days:
+                entry = self._geos_cache_entry(lat_lon, day, "assim", "O3")
+                try:
+                    ozone, met = json.loads(gzip.decompress(entry.read_bytes()))
+                except (OSError, EOFError, ValueError, zlib.error):
+                    # Not cached yet, or a truncated/corrupt entry: request the day again.
+                    missing.append(day)
+                    continue
+                store.extend(day, **self._geos_arrays(ozone, met))
+
+        # Group the missing days into runs of consecutive days no longer than max_chunk_days.
+        chunks = []
+        for day in missing:
+            if (
+                chunks
+                and len(chunks[-1]) < max_chunk_days
+                and pd.Timestamp(day) - pd.Timestamp(chunks[-1][-1]) == pd.Timedelta(days=1)
+            ):
+                chunks[-1].append(day)
+            else:
+                chunks.append([day])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._fetch_geos_chunk, lat_lon, chunk) for chunk in chunks]
 
             for future in tqdm(
                 as_completed(futures),
@@ -263,13 +1184,8 @@ class GEOS_CF(utilities):
                 desc=f"Downloading GEOS_CF Data for {lat_lon}",
             ):
                 try:
-                    response, dates, data = future.result()
-
-                    key = ("GEOS_CF", "Replay", f"{lat_lon}")
-                    if key not in self.data.keys():
-                        self.data[key] = {}
-
-                    self.data[("GEOS_CF", "Replay", f"{lat_lon}")][dates[0]] = data
+                    for day, (ozone, met) in future.result().items():
+                        store.extend(day, **self._geos_arrays(ozone, met))
 
                 except Exception as e:
                     self.troubleshoot["GEOS_CF"].append(f"{e}")
@@ -278,16 +1194,180 @@ class GEOS_CF(utilities):
 
 
 class TOLNet(GEOS_CF):
-    def __init__(self):
-        super().__init__()
-        self.products = self.get_product_types()
-        self.file_types = self.get_file_types()
-        self.instrument_groups = self.get_instrument_groups()
-        self.processing_types = self.get_processing_types()
+    tolnet_url = r"https://tolnet.larc.nasa.gov/api"
+
+    # Attribute name -> API endpoint of the reference tables describing the catalog.
+    reference_tables = {
+        "products": "data/product_types",
+        "file_types": "data/file_types",
+        "instrument_groups": "instruments/groups",
+        "processing_types": "data/processing_types",
+    }
+
+    # Column types of the file catalog returned by get_files_list.
+    catalog_dtypes = {
+        "row": "int16",
+        "count": "int16",
+        "id": "int16",
+        "file_name": "str",
+        "file_server_location": "str",
+        "author": "category",
+        "instrument_group_id": "int16",
+        "product_type_id": "int16",
+        "file_type_id": "int16",
+        "start_data_date": "datetime64[ns]",
+        "end_data_date": "datetime64[ns]",
+        "upload_date": "datetime64[ns]",
+        "public": "bool",
+        "instrument_group_name": "category",
+        "folder_name": "category",
+        "current_pi": "category",
+        "doi": "category",
+        "citation_url": "category",
+        "product_type_name": "category",
+        "processing_type_name": "category",
+        "file_type_name": "category",
+        "revision": "int16",
+        "near_real_time": "category",
+        "file_size": "int16",
+        "latitude": "int16",
+        "longitude": "int16",
+        "altitude": "int16",
+        "isAccessible": "bool",
+    }
+
+    def __init__(
+        self,
+        cache_dir=None,
+        cache_size_mb=2048,
+        use_cache=True,
+        cache_ttl=86400,
+        offline=False,
+        max_retries=4,
+        rate_limit=None,
+        catalog_ttl=7 * 86400,
+    ):
+        """
+        Parameters
+        ----------
+        cache_dir : STR, optional
+            The directory used to cache downloaded files. Defaults to ~/.cache/tolnet.
+        cache_size_mb : INT, optional
+            The maximum size of the file cache in megabytes. Defaults to 2048.
+        use_cache : BOOL, optional
+            Whether to keep downloaded files and a local copy of the file catalog on disk
+            and reuse them. Defaults to True.
+        cache_ttl : INT, optional
+            The number of seconds a cached reference table (products, file types, instrument
+            groups and processing types), or the catalog of a recent day, is used before it
+            is downloaded again. Defaults to one day.
+        offline : BOOL, optional
+            Serve the reference tables and the file catalog from what is cached, whatever
+            its age, without contacting the API. Defaults to False.
+        max_retries : INT, optional
+            The number of times a request that fails with a connection error, a timeout, a
+            429 or a 5xx status is retried, with exponential backoff. Defaults to 4.
+        rate_limit : FLOAT, optional
+            The maximum number of requests per second sent by all threads together, to
+            TOLNet and GEOS-CF alike. Defaults to None, no limit.
+        catalog_ttl : INT, optional
+            The number of seconds the cached catalog of a settled day, one synced more than
+            30 days after its date, is used before it is checked again for files uploaded
+            since, e.g. a reprocessed campaign. Defaults to one week. See refresh_catalog
+            to force a check.
+        """
+        cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".cache" / "tolnet"
+        super().__init__(cache_dir=cache_dir if use_cache else None)
+        self.cache_dir = cache_dir
+        self.cache = file_cache(self.cache_dir, cache_size_mb) if use_cache else None
+        self.catalog = (
+            file_catalog(self.cache_dir, self.catalog_dtypes, settled_ttl=catalog_ttl)
+            if use_cache
+            else None
+        )
+        self.cache_ttl = cache_ttl
+        self.offline = offline
+        self.reference = {}
+        self.timezone = "UTC"
+        self.request_dates = None
+        self.curtains = {}
         self.data = {}
+        self.profiles = {}
+        self.failed_files = None
         self.troubleshoot["TOLNet"] = []
+        self.max_retries = max_retries
+        self.set_rate_limit(rate_limit)
         return
 
+    @property
+    def products(self):
+        return self._reference_table("products")
+
+    @property
+    def file_types(self):
+        return self._reference_table("file_types")
+
+    @property
+    def instrument_groups(self):
+        return self._reference_table("instrument_groups")
+
+    @property
+    def processing_types(self):
+        return self._reference_table("processing_types")
+
+    def _reference_table(self, name):
+        """
+        Parameters
+        ----------
+        name : STR
+            One of the keys of TOLNet.reference_tables.
+
+        Returns
+        -------
+        The reference table as a DataFrame sorted by id. The table is downloaded on first
+        use and kept in memory for the life of the object. When caching is enabled it is
+        also shared with other TOLNet objects through a snapshot in cache_dir, which is
+        reused until it is older than cache_ttl, or always in offline mode. If the API
+        cannot be reached a stale snapshot is used instead.
+        """
+        if name in self.reference:
+            return self.reference[name]
+
+        snapshot = None
+        if self.cache is not None:
+            snapshot = self.cache_dir / "reference" / f"{name}.json"
+
+        records = None
+        stale = None
+        if snapshot is not None and snapshot.exists():
+            age = datetime.datetime.now().timestamp() - snapshot.stat().st_mtime
+            stale = json.loads(snapshot.read_text())
+            if self.offline or age < self.cache_ttl:
+                records = stale
+
+        if records is None and not self.offline:
+            try:
+                url = f"{self.tolnet_url}/{self.reference_tables[name]}"
+                response, records = self._request(url, "reference")
+                response.raise_for_status()
+                if snapshot is not None:
+                    snapshot.parent.mkdir(parents=True, exist_ok=True)
+                    partial = snapshot.with_name(f"{snapshot.name}.{threading.get_ident()}.part")
+                    partial.write_bytes(response.content)
+                    os.replace(partial, snapshot)
+            except Exception as e:
+                self.troubleshoot["TOLNet"].append(f"Error with pulling {name}: {e}")
+                records = stale
+
+        if records is None:
+            raise RuntimeError(
+                f"No {name} table is available: the API could not be used and there is no "
+                f"cached snapshot in {self.cache_dir}"
+            )
+
+        self.reference[name] = pd.DataFrame(records).sort_values(by=["id"])
+        return self.reference[name]
+
     def print_product_types(self):
         """
         Prints out all products and their respective IDs.
@@ -327,51 +1407,38 @@ class TOLNet(GEOS_CF):
         print(self.processing_types[["id", "processing_type_name"]].to_string(index=False), "\n")
         return
 
-    @staticmethod
-    def get_product_types():
+    def get_product_types(self):
         """
         Returns a DataFrame containing all product types.
         The returned DataFrame contains the columns id, processing_type_name, description,
         display_order, public, and show_on_graph_page.
         """
-        return pd.DataFrame(
-            requests.get("https://tolnet.larc.nasa.gov/api/data/product_types").json()
-        ).sort_values(by=["id"])
+        return self._reference_table("products").copy()
 
-    @staticmethod
-    def get_file_types():
+    def get_file_types(self):
         """
         Returns a DataFrame containing all file types.
         The returned DataFrame contains the columns id, file_type_name, description, display_order, and public.
         """
-        return pd.DataFrame(
-            requests.get("https://tolnet.larc.nasa.gov/api/data/file_types").json()
-        ).sort_values(by=["id"])
+        return self._reference_table("file_types").copy()
 
-    @staticmethod
-    def get_instrument_groups():
+    def get_instrument_groups(self):
         """
         Returns a DataFrame containing all instrument groups.
         The returned DataFrame contains the columns id, instrument_group_name, folder_name, description,
         display_order, current_pi(Principle Investigator), doi, and citation_url.
         """
-        return pd.DataFrame(
-            requests.get("https://tolnet.larc.nasa.gov/api/instruments/groups").json()
-        ).sort_values(by=["id"])
+        return self._reference_table("instrument_groups").copy()
 
-    @staticmethod
-    def get_processing_types():
+    def get_processing_types(self):
         """
         Returns a DataFrame containing all processing types.
         The returned DataFrame contains the columns id, processing_type_name, description, display_order,
         public, and show_on_graph_page.
         """
-        return pd.DataFrame(
-            requests.get("https://tolnet.larc.nasa.gov/api/data/processing_types").json()
-        ).sort_values(by=["id"])
+        return self._reference_table("processing_types").copy()
 
-    @staticmethod
-    def get_files_list(min_date, max_date):
+    def get_files_list(self, min_date, max_date, max_workers=8):
         """
         Parameters
         ----------
@@ -379,112 +1446,294 @@ class TOLNet(GEOS_CF):
             The starting date for the query, in YYYY-MM-DD format.
         max_date : STR
             The ending date for the query, in YYYY-MM-DD format.
+        max_workers : INT, optional
+            The number of catalog pages requested concurrently. Defaults to 8.
 
         Returns
         -------
         A DataFrame containing all files from the TOLNet API that fall between the two provided dates.
         The DataFrame contains each file name as well as various descriptors.
         """
-        dtypes = {
-            "row": "int16",
-            "count": "int16",
-            "id": "int16",
-            "file_name": "str",
-            "file_server_location": "str",
-            "author": "str",
-            "instrument_group_id": "int16",
-            "product_type_id": "int16",
-            "file_type_id": "int16",
-            "start_data_date": "datetime64[ns]",
-            "end_data_date": "datetime64[ns]",
-            "upload_date": "datetime64[ns]",
-            "public": "bool",
-            "instrument_group_name": "str",
-            "folder_name": "str",
-            "current_pi": "str",
-            "doi": "str",
-            "citation_url": "str",
-            "product_type_name": "str",
-            "processing_type_name": "str",
-            "file_type_name": "str",
-            "revision": "int16",
-            "near_real_time": "str",
-            "file_size": "int16",
-            "latitude": "int16",
-            "longitude": "int16",
-            "altitude": "int16",
-            "isAccessible": "bool",
-        }
+        files, _ = self._fetch_files_list(min_date, max_date, max_workers)
+        return files
+
+    def _fetch_files_list(self, min_date, max_date, max_workers=8):
+        """
+        Returns the file list of get_files_list and the numbers of the catalog pages that
+        could not be downloaded, so callers can tell a complete list from a partial one.
+        """
 
-        i = 1
-        url = f"https://tolnet.larc.nasa.gov/api/data/1?min_date={min_date}&max_date={max_date}&order=data_date&order_direction=desc"
-        response = requests.get(url)
-        data_frames = []
-        while response.status_code == 200:
-            data_frames.append(pd.DataFrame(response.json()))
-            i += 1
-            url = f"https://tolnet.larc.nasa.gov/api/data/{i}?min_date={min_date}&max_date={max_date}&order=data_date&order_direction=desc"
-            response = requests.get(url)
-
-        df = pd.concat(data_frames, ignore_index=True)
-        df["start_data_date"] = pd.to_datetime(df["start_data_date"])
-        df["end_data_date"] = pd.to_datetime(df["end_data_date"])
-        df["upload_date"] = pd.to_datetime(df["upload_date"])
-        return df.astype(dtypes)
+        def fetch_page(i):
+            """
+            Returns the records of a page, an empty list past the last page, or None if
+            the page could not be downloaded.
+            """
+            url = f"{self.tolnet_url}/data/{i}?min_date={min_date}&max_date={max_date}&order=data_date&order_direction=desc"
+            try:
+                response, page = self._request(url, "catalog")
+            except Exception:
+                return None
+            if page is None and response.status_code != 404:
+                return None
+            return page or []
+
+        # The first page tells us how many files match, and so how many pages to request.
+        pages = [fetch_page(1)]
+        if pages[0] and "count" in pages[0][0]:
+            n_pages = -(-int(pages[0][0]["count"]) // len(pages[0]))
+
+            if n_pages > 1:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    pages += list(executor.map(fetch_page, range(2, n_pages + 1)))
+        else:
+            # Without a count, walk the pages until an empty one. A page that fails is
+            # skipped rather than taken as the end, unless the next one fails as well.
+            while pages[-1] or (pages[-1] is None and (len(pages) < 2 or pages[-2] is not None)):
+                pages.append(fetch_page(len(pages) + 1))
+
+        failed_pages = [i for i, page in enumerate(pages, start=1) if page is None]
+        for i in failed_pages:
+            self.troubleshoot["TOLNet"].append(f"Error with pulling catalog page {i}")
+
+        # Decode every record straight into its typed column instead of building one
+        # DataFrame per page and casting the concatenated result.
+        records = [record for page in pages if page for record in page]
+        names = list(records[0].keys()) if records else list(self.catalog_dtypes.keys())
+        files = self._catalog_frame(
+            {name: [record.get(name) for record in records] for name in names}
+        )
+        return files, failed_pages
+
+    def query_files(self, min_date, max_date, max_workers=8, **kwargs):
+        """
+        Parameters
+        ----------
+        min_date : STR
+            The starting date for the query, in YYYY-MM-DD format.
+        max_date : STR
+            The ending date for the query, in YYYY-MM-DD format.
+        max_workers : INT, optional
+            The number of catalog pages requested concurrently. Defaults to 8.
+        **kwargs
+            The instrument_group, product_type, file_type and processing_type id lists
+            accepted by import_data, and latest_only (default True), which drops the
+            superseded revisions of each measurement before anything is downloaded.
+
+        Returns
+        -------
+        A DataFrame of the files between the two dates that match the filters. With caching
+        enabled only the days missing from the local catalog, or due a refresh, are pulled
+        from the API and the filtering is done by the catalog's indexes; otherwise the full
+        file list is downloaded and filtered in memory.
+        """
+        if self.catalog is None:
+            files = self.get_files_list(min_date, max_date, max_workers)
+            return (
+                filter_files(files, self.processing_types)
+                .daterange(**kwargs)
+                .instrument_group(**kwargs)
+                .product_type(**kwargs)
+                .file_type(**kwargs)
+                .processing_type(**kwargs)
+                .latest_revision(**kwargs)
+                .df
+            )
+
+        if not self.offline:
+            self._sync_catalog(
+                self.catalog.stale_ranges(min_date, max_date, self.cache_ttl), max_workers
+            )
+
+        processing_type_names = None
+        if kwargs.get("processing_type") is not None:
+            types = self.processing_types
+            processing_type_names = list(
+                types["processing_type_name"][types["id"].isin(kwargs["processing_type"])]
+            )
+
+        files = self._catalog_frame(
+            self.catalog.query(
+                min_date,
+                max_date,
+                instrument_group=kwargs.get("instrument_group"),
+                product_type=kwargs.get("product_type"),
+                file_type=kwargs.get("file_type"),
+                processing_type_name=processing_type_names,
+            )
+        )
+        return filter_files(files, None).latest_revision(**kwargs).df
+
+    def refresh_catalog(self, min_date, max_date, max_workers=8):
+        """
+        Parameters
+        ----------
+        min_date : STR
+            The starting date to refresh, in YYYY-MM-DD format.
+        max_date : STR
+            The ending date to refresh, in YYYY-MM-DD format.
+        max_workers : INT, optional
+            The number of catalog pages requested concurrently. Defaults to 8.
+
+        Returns
+        -------
+        A reference to the TOLNet object, with the local catalog of every day between the
+        two dates pulled from the API again, whatever the age of its last sync. Use it when
+        files are known to have been uploaded or reprocessed since.
+        """
+        if self.catalog is not None:
+            self._sync_catalog([(min_date, max_date)], max_workers)
+        return self
+
+    def _sync_catalog(self, ranges, max_workers=8):
+        """
+        Pulls the catalog of each (start, end) date range from the API into the local catalog.
+        """
+        for start, end in ranges:
+            files, failed_pages = self._fetch_files_list(start, end, max_workers)
+            # Days are only marked as synced when every catalog page came back.
+            if not failed_pages:
+                self.catalog.update(files, start, end)
+            else:
+                self.catalog.update(files)
+        return
+
+    def _catalog_frame(self, columns: dict):
+        """
+        Returns a catalog DataFrame built from lists of raw column values, converting each
+        column straight to its type in catalog_dtypes.
+        """
+        frame = {}
+        for name, values in columns.items():
+            dtype = self.catalog_dtypes.get(name)
+            if dtype == "category":
+                frame[name] = pd.Categorical(values)
+            elif dtype == "datetime64[ns]":
+                frame[name] = pd.to_datetime(list(values)).astype(dtype)
+            elif dtype == "str":
+                frame[name] = np.array([str(value) for value in values], dtype=object)
+            elif dtype is not None:
+                frame[name] = np.asarray(values).astype(dtype)
+            else:
+                frame[name] = np.array(values, dtype=object)
+
+        return pd.DataFrame(frame, copy=False)
 
     def _add_timezone(self, time):
-        return [utc.replace(tzinfo=tz.gettz("UTC")) for utc in time]
+        """
+        Returns the times as a UTC DatetimeIndex. Naive times are localized and aware
+        times converted in a single vectorized call.
+        """
+        time = pd.DatetimeIndex(time)
+        if time.tz is None:
+            return time.tz_localize("UTC")
+        return time.tz_convert("UTC")
 
     def change_timezone(self, timezone: str):
-        to_zone = tz.gettz(timezone)
+        """
+        Parameters
+        ----------
+        timezone : STR
+            An IANA timezone name, e.g. "America/New_York" or "UTC".
 
+        Returns
+        -------
+        A reference to the TOLNet object, with every profile re-indexed in the new timezone.
+        The times are stored as UTC instants, so converting an index only swaps its
+        timezone and leaves the underlying values untouched. GEOS-CF times stay in UTC and
+        are converted when they are plotted.
+        """
         for key in self.data.keys():
-            for filename in self.data[key].keys():
-                time = self.data[key][filename].index.to_list()
-                self.data[key][filename].index = [t.astimezone(to_zone) for t in time]
+            if key[0] == "GEOS_CF":
+                continue
+            for filename, data in self.data[key].items():
+                data.index = data.index.tz_convert(timezone)
 
+        self.timezone = timezone
         return self
 
-    def _json_to_dict(self, file_id: int):
+    def _json_to_dict(self, file_id: int, revision: int = None, upload_date=None):
         """
         Parameters
         ----------
         file_id : INT
             The ID of the file to retrieve from the API.
+        revision : INT, optional
+            The revision of the file, as listed by get_files_list.
+        upload_date : Timestamp, optional
+            The upload date of the file, as listed by get_files_list.
 
         Returns
         -------
-        A dictionary containing the file's ozone values and metadata.
+        A dictionary containing the file's ozone values and metadata, or None if the file
+        could not be downloaded after retrying. When a revision or upload date is given the
+        file is served from the local cache if that exact version was downloaded before;
+        without them the file is always downloaded.
         """
+        cacheable = self.cache is not None and (revision is not None or upload_date is not None)
+        if cacheable:
+            response = self.cache.get(file_id, revision, upload_date)
+            if response is not None:
+                return response
+
+        response = None
         try:
-            url = f"https://tolnet.larc.nasa.gov/api/data/json/{file_id}"
-            response = requests.get(url).json()
-        except Exception:
-            self.troubleshoot["TOLNet"].append(f"Error with pulling {file_id}")
+            url = f"{self.tolnet_url}/data/json/{file_id}"
+            raw, response = self._request(url, "file")
+            if response is None:
+                self.troubleshoot["TOLNet"].append(
+                    f"Error with pulling {file_id}: HTTP {raw.status_code}"
+                )
+            elif cacheable:
+                self.cache.put(file_id, revision, upload_date, raw.content)
+        except Exception as e:
+            self.troubleshoot["TOLNet"].append(f"Error with pulling {file_id}: {e}")
         return response
 
-    def _unpack_data(self, meta_data):
+    def _unpack_data(self, meta_data, dtype="float64"):
         """
         Parameters
         ----------
         meta_data : A dictionary of a file's metadata
+        dtype : STR, optional
+            The precision of the ozone values, "float64" (default) or "float32". float32
+            halves the memory used by each profile.
 
         Returns
         -------
-        A DataFrame containing that same metadata
+        A DataFrame of the file's ozone values, indexed by time with one column per altitude.
 
         """
-        df = pd.DataFrame(
-            meta_data["value"]["data"],
-            columns=meta_data["altitude"]["data"],
-            index=pd.to_datetime(meta_data["datetime"]["data"]),
-        )
-        df = df.apply(pd.to_numeric)
-        df[df.isnull()] = np.nan
-        df.sort_index(inplace=True)
-        return df
+        time = pd.to_datetime(meta_data["datetime"]["data"])
+        altitude = np.asarray(meta_data["altitude"]["data"], dtype=np.float64)
+
+        # Decode the whole value matrix in one pass; missing values (None) become NaN.
+        # Only fall back to column-wise parsing when the matrix holds non-numeric text.
+        try:
+            values = np.array(meta_data["value"]["data"], dtype=dtype)
+        except (TypeError, ValueError):
+            values = (
+                pd.DataFrame(meta_data["value"]["data"])
+                .apply(pd.to_numeric, errors="coerce")
+                .to_numpy(dtype=dtype)
+            )
 
-    def import_data(self, min_date, max_date, **kwargs):
+        if not time.is_monotonic_increasing:
+            order = np.argsort(time.asi8, kind="stable")
+            time, values = time[order], values[order]
+
+        return pd.DataFrame(np.ascontiguousarray(values), index=time, columns=altitude, copy=False)
+
+    def iter_files(
+        self,
+        min_date,
+        max_date,
+        max_workers=8,
+        max_connections=None,
+        dtype="float64",
+        max_pending=None,
+        files=None,
+        **kwargs,
+    ):
         """
         Parameters
         ----------
@@ -492,85 +1741,365 @@ class TOLNet(GEOS_CF):
             The starting date to take from. Formatted as YYYY-MM-DD.
         max_date: String
             The ending date to take data from. Formatted as YYYY-MM-DD.
-
+        max_workers : INT, optional
+            The number of files downloaded and unpacked concurrently. Defaults to 8.
+        max_connections : INT, optional
+            The maximum number of keep-alive connections opened to the TOLNet API.
+            Defaults to max_workers, so that every worker can reuse its own connection.
+        dtype : STR, optional
+            The precision of the ozone values, "float64" (default) or "float32".
+        max_pending : INT, optional
+            The maximum number of files downloaded ahead of the consumer. Defaults to twice
+            max_workers.
+        files : DataFrame, optional
+            The catalog rows to download instead of querying the catalog, for example
+            self.failed_files to retry the files a previous import could not read.
+
+        Yields
+        ------
+        A (key, date, profile, meta_data) tuple per file as soon as it has been unpacked,
+        where key is (instrument_group_name, processing_type_name, lat_lon). Profiles and
+        meta data are not kept on the object, so memory stays flat however many files are
+        read. Only the bookkeeping of the request is: the queried catalog in self.files
+        (unless files is given), the dates in self.request_dates, the catalog rows of the
+        files that failed in self.failed_files, and their errors in self.troubleshoot.
         """
-        params = {"GEOS_CF": False}
-        params.update(kwargs)
 
-        def process_file(file_name, file_id):
-            meta_data = self._json_to_dict(file_id)
-            data = self._unpack_data(meta_data)
-            data.index = self._add_timezone(data.index.to_list())
-            return file_name, meta_data, data
-
-        files = self.get_files_list(min_date, max_date)
-        self.files = (
-            filter_files(files, self.processing_types)
-            .daterange(**kwargs)
-            .instrument_group(**kwargs)
-            .product_type(**kwargs)
-            .file_type(**kwargs)
-            .processing_type(**kwargs)
-            .df
+        def process_file(file_name, file_id, revision, upload_date):
+            meta_data = self._json_to_dict(file_id, revision, upload_date)
+            if meta_data is None:
+                raise ValueError("the file could not be downloaded")
+            meta_data["fileInfo"].setdefault("file_name", file_name)
+            data = self._unpack_data(meta_data, dtype)
+            data.index = self._add_timezone(data.index).tz_convert(self.timezone)
+            return meta_data, data
+
+        if files is None:
+            self.files = self.query_files(min_date, max_date, max_workers, **kwargs)
+            files = self.files
+        self.request_dates = (min_date, max_date)
+        self.failed_files = files.iloc[:0]
+        failed = []
+
+        if max_connections is None:
+            max_connections = max_workers
+        if max_pending is None:
+            max_pending = 2 * max_workers
+        self._open_session(max_connections)
+
+        queue = zip(
+            files["file_name"],
+            files["id"],
+            files["revision"],
+            files["upload_date"],
         )
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        progress = tqdm(total=len(files), desc="Downloading TOLNet Data for")
+        pending = {}
+        try:
+            while True:
+                # Only submit more downloads while fewer than max_pending are in flight.
+                while len(pending) < max_pending:
+                    row = next(queue, None)
+                    if row is None:
+                        break
+                    pending[executor.submit(process_file, *row)] = row
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name, file_id = pending.pop(future)[:2]
+                    progress.update()
+                    try:
+                        meta_data, data = future.result()
+                        lat_lon = (
+                            str(meta_data["LATITUDE.INSTRUMENT"])
+                            + "x"
+                            + str(meta_data["LONGITUDE.INSTRUMENT"])
+                        )
+                        date = meta_data["fileInfo"]["start_data_date"].split(" ")[0]
+                        key = (
+                            meta_data["fileInfo"]["instrument_group_name"],
+                            meta_data["fileInfo"]["processing_type_name"],
+                            lat_lon,
+                        )
+                    except Exception as e:
+                        self.troubleshoot["TOLNet"].append(
+                            f"Error processing file {file_name}: {e}"
+                        )
+                        failed.append(file_id)
+                        self.failed_files = files[files["id"].isin(failed)]
+                        continue
+
+                    yield key, date, data, meta_data
+        finally:
+            progress.close()
+            executor.shutdown(wait=True, cancel_futures=True)
+        return
 
-        self.request_dates = (min_date, max_date)
-        self.meta_data = {}
+    def resume_import(self, max_workers=8, max_connections=None, dtype="float64", **kwargs):
+        """
+        Retries the files that the last import_data call could not download or read,
+        adding them to the data, metadata and curtains already loaded. Files that fail
+        again stay in self.failed_files, so this can be repeated.
 
-        # Use ThreadPoolExecutor for multithreading
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            future_to_file = {
-                executor.submit(process_file, file_name, file_id): file_name
-                for file_name, file_id in zip(self.files["file_name"], self.files["id"])
-            }
+        Returns
+        -------
+        A reference to the TOLNet object.
+        """
+        if self.failed_files is None or self.failed_files.empty:
+            return self
+        return self.import_data(
+            *self.request_dates,
+            max_workers=max_workers,
+            max_connections=max_connections,
+            dtype=dtype,
+            files=self.failed_files,
+            **kwargs,
+        )
 
-            for future in tqdm(
-                as_completed(future_to_file),
-                total=len(future_to_file),
-                desc="Downloading TOLNet Data for",
-            ):
-                file_name = future_to_file[future]
-                try:
-                    file_name, meta_data, data = future.result()
-
-                    lat_lon = (
-                        str(meta_data["LATITUDE.INSTRUMENT"])
-                        + "x"
-                        + str(meta_data["LONGITUDE.INSTRUMENT"])
-                    )
-                    date = meta_data["fileInfo"]["start_data_date"].split(" ")[0]
-                    key = (
-                        meta_data["fileInfo"]["instrument_group_name"],
-                        meta_data["fileInfo"]["processing_type_name"],
-                        lat_lon,
-                    )
-
-                    if key not in self.data.keys():
-                        self.data[key] = {}
-                        self.meta_data[key] = {}
-
-                    self.data[key][date] = data
-                    self.meta_data[key][file_name] = meta_data
+    def import_data(
+        self, min_date, max_date, max_workers=8, max_connections=None, dtype="float64", **kwargs
+    ):
+        """
+        Parameters
+        ----------
+        min_date : String
+            The starting date to take from. Formatted as YYYY-MM-DD.
+        max_date: String
+            The ending date to take data from. Formatted as YYYY-MM-DD.
+        max_workers : INT, optional
+            The number of files downloaded and unpacked concurrently. Defaults to 8.
+        max_connections : INT, optional
+            The maximum number of keep-alive connections opened to the TOLNet API.
+            Defaults to max_workers, so that every worker can reuse its own connection.
+        dtype : STR, optional
+            The precision of the ozone values, "float64" (default) or "float32".
 
-                except Exception as e:
-                    self.troubleshoot["TOLNet"].append(f"Error processing file {file_name}: {e}")
+        """
+        params = {"GEOS_CF": False}
+        params.update(kwargs)
+
+        if kwargs.get("files") is None:
+            self.meta_data = {}
+            self.profiles = {}
+        for key, date, data, meta_data in self.iter_files(
+            min_date, max_date, max_workers, max_connections, dtype, **kwargs
+        ):
+            file_name = meta_data["fileInfo"]["file_name"]
+            try:
+                if key not in self.data.keys():
+                    self.data[key] = {}
+                if key not in self.meta_data.keys():
+                    self.meta_data[key] = {}
+                    self.profiles[key] = {}
+
+                self.data[key][date] = data
+                self.meta_data[key][file_name] = meta_data
+                # The same DataFrame, by file: self.data keeps one profile per date.
+                self.profiles[key][file_name] = data
+
+                if key not in self.curtains:
+                    attrs = {
+                        "instrument_group": key[0],
+                        "processing_type": key[1],
+                        "lat_lon": key[2],
+                        "location": meta_data["attributes"]["DATA_LOCATION"],
+                    }
+                    self.curtains[key] = curtain_store(attrs, dtype)
+                self.curtains[key].add(data)
+
+            except Exception as e:
+                self.troubleshoot["TOLNet"].append(f"Error processing file {file_name}: {e}")
 
         if params["GEOS_CF"]:
-            keys = list(self.data.keys())
-            for key in keys:
-                lat_lon = key[2]
+            # Sites sharing a location need the same GEOS-CF column only once.
+            for lat_lon in sorted({key[2] for key in self.curtains}):
                 self.get_geos_data_multithreaded(
                     lat_lon, self.request_dates[0], self.request_dates[1]
                 )
 
         return self
 
-    def tolnet_curtains(self, **kwargs):
+    def save_curtains(self, directory, format="nc"):
+        """
+        Parameters
+        ----------
+        directory : STR
+            The directory to write the curtains to. It is created if needed.
+        format : STR, optional
+            "nc" for NetCDF (default) or "zarr".
+
+        Returns
+        -------
+        A list of the paths written, one per site.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        paths = []
+        for key, curtain in self.curtains.items():
+            name = "_".join(key).replace(" ", "_").replace("\\", "").replace("/", "")
+            path = directory / f"{name}.{format}"
+            curtain.save(path)
+            paths.append(path)
+        return paths
+
+    # Catalog columns copied onto every exported profile.
+    export_columns = [
+        "id",
+        "file_name",
+        "instrument_group_id",
+        "instrument_group_name",
+        "product_type_id",
+        "product_type_name",
+        "processing_type_name",
+        "file_type_name",
+        "revision",
+        "start_data_date",
+        "end_data_date",
+        "upload_date",
+        "near_real_time",
+    ]
+
+    def export_parquet(
+        self, directory, min_date=None, max_date=None, layout="long", max_workers=8, **kwargs
+    ):
+        """
+        Parameters
+        ----------
+        directory : STR
+            The root of the dataset. It is created if needed.
+        min_date : STR, optional
+            With max_date, download and export the files between the two dates one at a
+            time, as they arrive, without keeping them in memory. Otherwise the profiles
+            already loaded by import_data are exported as they were decoded, in the dtype
+            chosen at import, without decoding their payloads again.
+        max_date : STR, optional
+            The ending date of the files to export, formatted as YYYY-MM-DD.
+        layout : STR, optional
+            "long" (default) writes one row per time and altitude with time, altitude and
+            ozone columns, skipping missing values. "wide" writes one row per time with one
+            column per altitude.
+        max_workers : INT, optional
+            The number of files downloaded concurrently when exporting by date.
+        **kwargs
+            The filters accepted by import_data.
+
+        Returns
+        -------
+        A list of the Parquet files written. Each file is written to
+        directory/instrument_group=<name>/date=<YYYY-MM-DD>/<id>_r<revision>.parquet with
+        the catalog columns in export_columns, and the site location, on every row, so the
+        whole directory can be opened as one hive-partitioned dataset, for example with
+        pyarrow.dataset.dataset(directory, partitioning="hive") and filtered on the
+        partitions or any column without reading the rest. Needs pyarrow, installed with
+        the "parquet" extra.
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "export_parquet needs pyarrow: pip install pyarrow, or the 'parquet' extra"
+            ) from e
+
+        if layout not in ("long", "wide"):
+            raise ValueError(f"layout must be 'long' or 'wide', not {layout!r}")
+
+        directory = Path(directory)
+        if min_date is not None and max_date is not None:
+            self.files = self.query_files(min_date, max_date, max_workers, **kwargs)
+            profiles = (
+                (key, data, meta_data)
+                for key, _, data, meta_data in self.iter_files(
+                    min_date, max_date, max_workers, files=self.files, **kwargs
+                )
+            )
+        else:
+            profiles = (
+                (key, self.profiles[key][file_name], meta_data)
+                for key, files in self.meta_data.items()
+                for file_name, meta_data in files.items()
+            )
+
+        catalog = {}
+        if getattr(self, "files", None) is not None and len(self.files):
+            columns = [name for name in self.export_columns if name in self.files.columns]
+            files = self.files[~self.files["file_name"].duplicated(keep="last")]
+            catalog = files[columns].set_index("file_name", drop=False).to_dict("index")
+
+        paths = []
+        for key, data, meta_data in profiles:
+            info = meta_data["fileInfo"]
+            row = catalog.get(info.get("file_name"), {})
+            time = self._add_timezone(data.index)
+
+            if layout == "long":
+                values = data.to_numpy()
+                rows, levels = np.nonzero(~np.isnan(values))
+                frame = pd.DataFrame(
+                    {
+                        "time": time[rows],
+                        "altitude": data.columns.to_numpy(dtype=np.float64)[levels],
+                        "ozone": values[rows, levels],
+                    }
+                )
+            else:
+                frame = data.set_axis([f"{altitude:g}" for altitude in data.columns], axis=1)
+                frame.insert(0, "time", time)
+                frame = frame.reset_index(drop=True)
+
+            for name in self.export_columns:
+                if name in row:
+                    frame[name] = row[name]
+                elif name in info:
+                    frame[name] = info[name]
+            frame["lat_lon"] = key[2]
+            frame["latitude"] = float(meta_data["LATITUDE.INSTRUMENT"])
+            frame["longitude"] = float(meta_data["LONGITUDE.INSTRUMENT"])
+            frame["location"] = meta_data["attributes"]["DATA_LOCATION"]
+
+            group = str(key[0]).replace("\\", "").replace("/", "")
+            date = str(info["start_data_date"]).split(" ")[0]
+            name = f"{row.get('id', info.get('file_name', date))}_r{row.get('revision', 0)}"
+            path = directory / f"instrument_group={group}" / f"date={date}" / f"{name}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            frame.to_parquet(path, index=False)
+            paths.append(path)
+        return paths
+
+    def load_curtains(self, paths):
+        """
+        Parameters
+        ----------
+        paths : LIST
+            NetCDF files or Zarr stores written by save_curtains.
+
+        Returns
+        -------
+        A reference to the TOLNet object, with the curtains added to self.curtains so they
+        can be plotted or analysed without downloading the files again.
+        """
+        for path in paths:
+            curtain = curtain_store.load(path)
+            key = (
+                curtain.attrs["instrument_group"],
+                curtain.attrs["processing_type"],
+                curtain.attrs["lat_lon"],
+            )
+            self.curtains[key] = curtain
+        return self
+
+    def tolnet_curtains(self, decimate=False, **kwargs):
         """
         Parameters
         ----------
         timezone : INT, optional
             The timezone to display the x-axis times in. Defaults to None.
+        decimate : BOOL, optional
+            Average the TOLNet profiles onto at most one column per pixel of the figure
+            width instead of plotting every native time step. Defaults to False.
         **kwargs : TYPE
             Parameters for the plots. The accepted fields are title, xlabel, ylabel,
             xlims, ylims, yticks, surface, sonde.
@@ -580,19 +2109,68 @@ class TOLNet(GEOS_CF):
         A reference to the TOLNet object.
 
         """
+        for X, Y, Z, params in self._curtain_arrays(decimate, **kwargs):
+            self.curtain_plot(X, Y, Z, **params)
 
-        ncmap, nnorm = self.O3_curtain_colors()
-        for key in self.data.keys():
-            lim = self.request_dates
-            xlims = [np.datetime64(lim[0]), np.datetime64(lim[-1])]
+        return self
+
+    def render_curtains(self, directory=".", max_workers=None, decimate=False, **kwargs):
+        """
+        Renders the curtain of every site to a PNG file without displaying anything, for
+        unattended jobs. The figures are drawn with the non-interactive Agg backend in a
+        pool of worker processes.
+
+        Parameters
+        ----------
+        directory : STR, optional
+            The directory the PNG files are written to. Defaults to the working directory.
+        max_workers : INT, optional
+            The number of rendering processes. Defaults to the number of CPUs.
+        decimate : BOOL, optional
+            See tolnet_curtains.
+        **kwargs : TYPE
+            Parameters for the plots, as in tolnet_curtains.
+
+        Returns
+        -------
+        A list of the paths written.
+
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        paths = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_headless) as executor:
+            futures = []
+            for X, Y, Z, params in self._curtain_arrays(decimate, **kwargs):
+                params["savename"] = str(directory / params["savename"])
+                params["show"] = False
+                futures.append(executor.submit(_render_curtain, X, Y, Z, params))
+
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Rendering"):
+                try:
+                    paths.append(Path(future.result()))
+                except Exception as e:
+                    self.troubleshoot["TOLNet"].append(f"Error rendering curtain: {e}")
+
+        return paths
+
+    def _curtain_arrays(self, decimate=False, **kwargs):
+        """
+        Yields the X, Y, Z arrays and plot parameters of each site's curtain.
+        """
+        keys = [*self.curtains.keys(), *[key for key in self.data.keys() if key[0] == "GEOS_CF"]]
+        for key in keys:
+            if self.request_dates is not None:
+                lim = self.request_dates
+                xlims = [np.datetime64(lim[0]), np.datetime64(lim[-1])]
+            else:
+                xlims = list(self.curtains[key].time_range())
 
             if key[0] == "GEOS_CF":
                 location = "GEOS-CF data"
             else:
-                first_file = list(self.meta_data[key])[0]
-                location = self.meta_data[key][first_file]["attributes"]["DATA_LOCATION"].replace(
-                    ".", ", "
-                )
+                location = self.curtains[key].attrs["location"].replace(".", ", ")
 
             title = f"{location} ({key[0]} / {key[1]}) \n {str(xlims[0])} - {str(xlims[1])}"
 
@@ -604,15 +2182,16 @@ class TOLNet(GEOS_CF):
             params = {"title": title, "savefig": False, "savename": savename, "xlims": xlims}
 
             if "GEOS_CF" not in key[0]:
-                df = []
-                for filename in self.data[key].keys():
-                    df.append(self.data[key][filename])
-
-                df = pd.concat(df)
-                df.sort_index(inplace=True)
-                timedelta = min(
-                    [(df.index[i] - df.index[i - 1]).seconds for i in range(1, len(df))]
-                )
+                curtain = self.curtains[key]
+                df = curtain.frame(self.timezone)
+                timedelta = curtain.cadence()
+
+                if decimate and len(df) > 1:
+                    figsize = kwargs.get("figsize", (15, 8))
+                    pixels = int(figsize[0] * mpl.rcParams["figure.dpi"])
+                    span = (df.index[-1] - df.index[0]).total_seconds()
+                    timedelta = max(timedelta, int(np.ceil(span / pixels)))
+
                 df = df.resample(f"{timedelta}s").mean()
 
                 X, Y, Z = (
@@ -622,28 +2201,31 @@ class TOLNet(GEOS_CF):
                 )
 
             else:
-                T = []
-                h = []
-                o = []
-                for date in self.data[key]:
-                    t = self.data[key][date]["time"]
-                    h.append(self.data[key][date]["height"])
-                    o.append(self.data[key][date]["ozone"])
-                    T.append(pd.DataFrame(t))
-
-                time = pd.concat(T).set_index([0], drop=False).sort_index()
-                ozone = pd.concat(o).sort_index()
-                height = pd.concat(h).sort_index()
-
-                X = time.sort_index(axis=1, ascending=False).values
-                Y = height.sort_index(axis=1, ascending=False).values / 1000
-                Z = ozone.sort_index(axis=1, ascending=False).values
+                time, ozone, height = self.data[key].arrays()
+                time = pd.DatetimeIndex(time, tz="UTC").tz_convert(self.timezone)
+
+                # contourf needs a time for every (time, level) cell; broadcasting the one
+                # time vector gives that view without copying it.
+                X = np.broadcast_to(time.tz_localize(None).values[:, None], ozone.shape)
+                Y = height[:, ::-1] / 1000
+                Z = ozone[:, ::-1]
                 params["use_countourf"] = True
 
             params.update(kwargs)
-            self.curtain_plot(X, Y, Z, **params)
+            yield X, Y, Z, params
 
-        return self
+
+def _headless():
+    plt.switch_backend("Agg")
+    return
+
+
+def _render_curtain(X, Y, Z, params):
+    """
+    Draws one curtain in a rendering process and returns the path of the saved figure.
+    """
+    utilities().curtain_plot(X, Y, Z, **params)
+    return params["savename"]
 
 
 # %% Example